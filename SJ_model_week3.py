@@ -1,115 +1,98 @@
 from xgboost import XGBRegressor
 from sklearn.model_selection import train_test_split, RandomizedSearchCV, cross_val_score
 from scipy.stats import randint, uniform
-from sklearn.ensemble import RandomForestRegressor, StackingRegressor
+from sklearn.ensemble import RandomForestRegressor
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_squared_error
+import os
+import json
 import joblib
 import pandas as pd
 import numpy as np
-import re
-from textblob import TextBlob
 from sklearn.preprocessing import LabelEncoder
-
-
-sheet_id = "1JcESl7qCCBvS6xpWMZplhCXunvmkcNU_"
-gid = "95254209"
-
-url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}"
-
-df = pd.read_csv(url)
-
-
-encoder = LabelEncoder()
-
-df['company_encoded'] = encoder.fit_transform(df['inferred company'])
-df['username_encoded'] = encoder.fit_transform(df['username'])
-df.dropna(subset=['content', 'username', 'inferred company', 'likes'], inplace=True)
-df.fillna({'media':'no_media'}, inplace=True)
-df['has_media'] = df['media'].apply(lambda x: x != 'no_media')
-df['content'] = df['content'].astype(str).str.strip().str.lower()
-df['datetime'] = pd.to_datetime(df['date'], errors='coerce')
-df.dropna(subset=['content', 'username', 'inferred company', 'likes'], inplace=True)
-df.fillna({'media':'no_media'}, inplace=True)
-df['has_media'] = df['media'].apply(lambda x: x != 'no_media')
-df['content'] = df['content'].astype(str).str.strip().str.lower()
-df['datetime'] = pd.to_datetime(df['date'], errors='coerce')
-df['hour'] = df['datetime'].dt.hour
-df['day_of_week'] = df['datetime'].dt.day_name()
-df['day_of_week_encoded'] = encoder.fit_transform(df['day_of_week'])
-df['word_count'] = df['content'].apply(lambda x: len(x.split()))
-df['char_count'] = df['content'].apply(len)
-def get_polarity(text):
-    return TextBlob(str(text)).sentiment.polarity
-
-def get_sentiment(polarity):
-    if polarity > 0:
-        return 'Positive'
-    elif polarity < 0:
-        return 'Negative'
+from company_stats import CompanyIndex
+from compiled_model import CompiledStackingModel
+from data_ingest import TRAINING_COLUMNS, load_dataset
+from features import FEATURE_COLUMNS, FeatureExtractor, get_sentiment
+from model_bundle import file_digest, publish
+from stacking import CachedStackingRegressor
+from streaming_features import build_feature_files, load_feature_files
+from tfidf import TfidfVocabulary
+from tuning import load_best_params, successive_halving
+
+
+if os.environ.get('TIE_STREAMING_FEATURES') == '1':
+    # out of core: two chunked passes write the float32 feature matrix to TIE_FEATURE_DIR
+    # and it is memory-mapped back (streaming_features.py), for corpora bigger than RAM
+    feature_dir = build_feature_files(
+        os.environ.get('TIE_DATA_SOURCE'),
+        os.environ.get('TIE_FEATURE_DIR', 'tie_features'),
+        chunksize=int(os.environ.get('TIE_FEATURE_CHUNKSIZE', 100000))
+    )
+    X, y, tfidf_vocab = load_feature_files(feature_dir)
+    with open(os.path.join(feature_dir, 'meta.json')) as f:
+        company_table = CompanyIndex.from_table(json.load(f)['companies'])
+else:
+    # TIE_DATA_SOURCE can point at a local CSV; either way the parsed data is cached as
+    # Parquet (data_ingest.py), so only the first run downloads or parses the sheet
+    df = load_dataset(os.environ.get('TIE_DATA_SOURCE'), columns=TRAINING_COLUMNS)
+
+
+    encoder = LabelEncoder()
+    extractor = FeatureExtractor()
+
+    df['company_encoded'] = encoder.fit_transform(df['inferred company'])
+    df['username_encoded'] = encoder.fit_transform(df['username'])
+    df.dropna(subset=['content', 'username', 'inferred company', 'likes'], inplace=True)
+    df.fillna({'media':'no_media'}, inplace=True)
+    df['has_media'] = df['media'].apply(lambda x: x != 'no_media')
+    df['content'] = df['content'].astype(str).str.strip().str.lower()
+    df['datetime'] = pd.to_datetime(df['date'], errors='coerce')
+    df.dropna(subset=['content', 'username', 'inferred company', 'likes'], inplace=True)
+    df.fillna({'media':'no_media'}, inplace=True)
+    df['has_media'] = df['media'].apply(lambda x: x != 'no_media')
+    df['content'] = df['content'].astype(str).str.strip().str.lower()
+    df['datetime'] = pd.to_datetime(df['date'], errors='coerce')
+    df['hour'] = df['datetime'].dt.hour
+    df['day_of_week'] = df['datetime'].dt.day_name()
+    df['day_of_week_encoded'] = encoder.fit_transform(df['day_of_week'])
+    # word/char counts, emojis, hashtags, urls and sentiment all come from the shared
+    # extractor so serving (my_app.py) computes exactly the same columns;
+    # TIE_FEATURE_JOBS > 1 shards it over a process pool (1 = the serial reference path)
+    feature_jobs = int(os.environ.get('TIE_FEATURE_JOBS', 1))
+    if feature_jobs == 1:
+        text_features = extractor.text_features(df['content'])
     else:
-        return 'Neutral'
-
-df['polarity'] = df['content'].apply(get_polarity)
-df['sentiment'] = df['polarity'].apply(get_sentiment)
-
-def count_emojis(text):
-    emoji_pattern = re.compile(
-        "["
-        "\U0001F600-\U0001F64F"  # emoticons
-        "\U0001F300-\U0001F5FF"  # symbols & pictographs
-        "\U0001F680-\U0001F6FF"  # transport & map symbols
-        "\U0001F1E0-\U0001F1FF"  # flags (iOS)
-        "]+", flags=re.UNICODE)
-    return len(emoji_pattern.findall(str(text)))
-
-df['emoji_count'] = df['content'].apply(count_emojis)
-
-def has_hashtag(text):
-    # Returns 1 if at least one hashtag is present, else 0
-    return 1 if re.search(r'#\w+', str(text)) else 0
-
-df['has_hashtag'] = df['content'].apply(has_hashtag)
-
-def has_url(text):
-    url_regex = r'(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|(\([^\s()<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:\'".,<>?«»“”‘’]))'
-    return 1 if re.search(url_regex, str(text)) else 0
-
-df['has_url'] = df['content'].apply(has_url)
-
-from sklearn.feature_extraction.text import TfidfVectorizer
-import numpy as np
-vectorizer = TfidfVectorizer()
-tfidf_matrix = vectorizer.fit_transform(df['content'])
+        text_features = extractor.text_features_parallel(df['content'], jobs=feature_jobs)
+    df[text_features.columns] = text_features
+    df['sentiment'] = df['polarity'].apply(get_sentiment)
 
-df['tfidf_mean'] = np.asarray(tfidf_matrix.mean(axis=1)).flatten()
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    import numpy as np
+    vectorizer = TfidfVectorizer()
+    tfidf_matrix = vectorizer.fit_transform(df['content'])
 
-company_avg_likes = df.groupby('inferred company')['likes'].mean().rename('company_avg_likes')
-df = df.merge(company_avg_likes, on='inferred company', how='left')
+    df['tfidf_mean'] = np.asarray(tfidf_matrix.mean(axis=1)).flatten()
 
+    company_avg_likes = df.groupby('inferred company')['likes'].mean().rename('company_avg_likes')
+    df = df.merge(company_avg_likes, on='inferred company', how='left')
 
 
 
-# df.head() '''already checked'''
 
-X = df[['word_count', 'char_count', 'has_media', 'hour','sentiment','company_encoded','emoji_count','has_url','has_hashtag','tfidf_mean','company_avg_likes']]
-y = df['likes']
+    # df.head() '''already checked'''
 
-sentiment_encoded = pd.get_dummies(df['sentiment'], prefix='sentiment', drop_first=True)
-X = X.drop('sentiment', axis=1)
-X = pd.concat([X, sentiment_encoded], axis=1)
+    X = df[FEATURE_COLUMNS]
+    y = df['likes']
+    # vocabulary + IDF weights, so the app computes the real tfidf_mean per tweet
+    tfidf_vocab = TfidfVocabulary.from_vectorizer(vectorizer)
+    # code + average likes per company, for the app's company features
+    company_table = CompanyIndex.from_frame(df)
 
 
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-model1 = RandomForestRegressor()
-model1.fit(X_train, y_train)
-
 rmse=[]
-preds1 = model1.predict(X_test)
-mse1 = mean_squared_error(y_test, preds1)
-rmse_RFR = np.sqrt(mse1)
-rmse.append(rmse_RFR)
 
 from scipy.stats import randint, uniform
 
@@ -143,14 +126,40 @@ random_search.fit(X_train, y_train)
 
 print("Best parameters:", random_search.best_params_)'''
 
+# TIE_TUNE=1 runs the resumable successive-halving search (tuning.py) on the training
+# split; the winner lands in best_params.json and the xgb base model below picks it up
+if os.environ.get('TIE_TUNE') == '1':
+    successive_halving(X_train, y_train, journal_path=os.environ.get('TIE_TUNING_JOURNAL', 'tuning_journal.jsonl'),
+                       jobs=int(os.environ.get('TIE_TUNING_JOBS', -1)))
+xgb_params = load_best_params('xgb', default={'n_estimators': 100, 'learning_rate': 0.1})
+
 base_models1 = [
     ('rf', RandomForestRegressor(n_estimators=100, random_state=42)),
-    ('xgb', XGBRegressor(n_estimators=100, learning_rate=0.1, random_state=42))
+    ('xgb', XGBRegressor(**xgb_params, random_state=42))
     ]
 
 
-model4 = StackingRegressor(estimators=base_models1, final_estimator=model2)
+# base learners are fit concurrently and their out-of-fold predictions cached on disk
+# (stacking.py), so trying another final estimator doesn't retrain rf/xgb:
+# TIE_FINAL_ESTIMATOR=lr (default) | xgb | rf
+final_estimators = {
+    'lr': model2,
+    'xgb': XGBRegressor(random_state=42),
+    'rf': RandomForestRegressor(random_state=42),
+}
+model4 = CachedStackingRegressor(
+    estimators=base_models1,
+    final_estimator=final_estimators[os.environ.get('TIE_FINAL_ESTIMATOR', 'lr')],
+    jobs=int(os.environ.get('TIE_STACK_JOBS', 0)) or None
+)
 model4.fit(X_train, y_train)
+
+# the stack's own rf, instead of fitting a second forest just for this number
+preds1 = model4.named_estimators_['rf'].predict(X_test)
+mse1 = mean_squared_error(y_test, preds1)
+rmse_RFR = np.sqrt(mse1)
+rmse.insert(0, rmse_RFR)
+
 preds4 = model4.predict(X_test)
 mse4 = mean_squared_error(y_test, preds4)
 rmse_SR = np.sqrt(mse4)
@@ -181,3 +190,22 @@ print("Mean RMSE:", rmse_XGB.mean())'''
 #print(rmse_SR)
 
 joblib.dump(model4, 'like_predictor.pkl', compress=3)
+tfidf_vocab.save('tfidf_vocab.npz')
+company_table.save('company_table.npz')
+
+# TIE_MMAP_ARTIFACT=1 also writes the uncompressed compiled model that the app can
+# memory-map (TIE_MMAP_MODEL=1) so gunicorn workers share one copy of the trees
+if os.environ.get('TIE_MMAP_ARTIFACT') == '1':
+    compiled_model = CompiledStackingModel(model4, model_sha256=file_digest('like_predictor.pkl'))
+    compiled_model.verify(model4, X_test)
+    compiled_model.save('like_predictor_compiled.joblib')
+
+# TIE_BUNDLE_DIR publishes everything above as a new versioned bundle; apps serving
+# from that directory hot-reload it (model_bundle.py)
+if os.environ.get('TIE_BUNDLE_DIR'):
+    os.makedirs(os.environ['TIE_BUNDLE_DIR'], exist_ok=True)
+    bundle_files = {'model': 'like_predictor.pkl', 'tfidf': 'tfidf_vocab.npz', 'companies': 'company_table.npz'}
+    if os.environ.get('TIE_MMAP_ARTIFACT') == '1':
+        # only when written by this run, an old file would be out of step with the model
+        bundle_files['compiled'] = 'like_predictor_compiled.joblib'
+    publish(os.environ['TIE_BUNDLE_DIR'], bundle_files, source='full', test_rmse=float(rmse_SR))
@@ -0,0 +1,270 @@
+"""Offline benchmark for the feature functions, the model and the Flask app.
+
+Builds a synthetic tweet dataset, trains a small stacking model shaped like the one in
+SJ_model_week3.py (RF + XGB -> LinearRegression) into a temp dir, points the app at it
+through TIE_MODEL_PATH / TIE_TFIDF_PATH / TIE_COMPANY_TABLE_PATH, warms it up and times
+every stage. No network needed.
+
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+
+Other TIE_* settings (TIE_COMPILED_MODEL, TIE_SENTIMENT_BACKEND, ...) are honoured, so the
+same script benchmarks each serving mode. With --compare the exit status is 1 when any
+benchmark got slower than --threshold times its baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+COMPANIES = ['Nike', 'Starbucks', 'Apple', 'Tesla', 'Our Company', 'Google', 'Samsung']
+MESSAGES = [
+    'our new running shoes are here', 'free coffee this friday', 'we hate waiting in line',
+    'a really good update for everyone', 'not a bad way to start the week', 'big news 🚀🔥',
+    'join us live https://example.com/live', 'thank you for 1M followers #grateful',
+    'terrible weather, perfect latte ☕', 'stay hydrated', 'what should we build next?', '',
+]
+
+
+def synthetic_tweets(n, seed=0):
+    """n generated tweets with company, media, hour and a likes target loosely tied to them"""
+    from tweet_generator import SimpleTweetGenerator
+
+    rng = random.Random(seed)
+    generator = SimpleTweetGenerator()
+    tweet_types = generator.get_supported_tweet_types()
+    rows = []
+    for _ in range(n):
+        company = rng.choice(COMPANIES)
+        message = rng.choice(MESSAGES)
+        tweet = generator.generate_tweet(company, rng.choice(tweet_types), message or None, message or None)
+        has_media = rng.random() < 0.4
+        hour = rng.randrange(24)
+        likes = (200 + 40 * COMPANIES.index(company) + 150 * has_media + 8 * min(hour, 23 - hour)
+                 + 2 * len(tweet) + rng.lognormvariate(4, 1))
+        rows.append({'content': tweet, 'company': company.lower(), 'has_media': has_media,
+                     'hour': hour, 'likes': likes})
+    return pd.DataFrame(rows)
+
+
+def train_small_model(df, directory, seed=0):
+    """Fits the same pipeline shape as SJ_model_week3.py, just smaller; returns artifact paths"""
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor, StackingRegressor
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import LabelEncoder
+    from xgboost import XGBRegressor
+
+    from company_stats import CompanyIndex
+    from features import FeatureExtractor
+    from tfidf import TfidfVocabulary
+
+    vectorizer = TfidfVectorizer()
+    tfidf_mean = np.asarray(vectorizer.fit_transform(df['content']).mean(axis=1)).ravel()
+    company_avg_likes = df.groupby('company')['likes'].transform('mean')
+    company_encoded = LabelEncoder().fit_transform(df['company'])
+    X = FeatureExtractor().transform(
+        df['content'],
+        has_media=df['has_media'],
+        hour=df['hour'],
+        company_encoded=company_encoded,
+        company_avg_likes=company_avg_likes,
+        tfidf_mean=tfidf_mean,
+    )
+    model = StackingRegressor(
+        estimators=[
+            ('rf', RandomForestRegressor(n_estimators=30, max_depth=8, random_state=seed)),
+            ('xgb', XGBRegressor(n_estimators=30, max_depth=4, learning_rate=0.1, random_state=seed)),
+        ],
+        final_estimator=LinearRegression(),
+    )
+    model.fit(X, df['likes'])
+
+    model_path = os.path.join(directory, 'like_predictor.pkl')
+    tfidf_path = os.path.join(directory, 'tfidf_vocab.npz')
+    company_path = os.path.join(directory, 'company_table.npz')
+    joblib.dump(model, model_path, compress=3)
+    TfidfVocabulary.from_vectorizer(vectorizer).save(tfidf_path)
+    CompanyIndex.from_frame(pd.DataFrame({
+        'company': df['company'], 'company_encoded': company_encoded, 'company_avg_likes': company_avg_likes,
+    }), company='company').save(company_path)
+    return model_path, tfidf_path, company_path
+
+
+def measure(fn, inputs, repeat=1):
+    """Calls fn(x) for every x in inputs, `repeat` times; latency stats in microseconds"""
+    timings = []
+    for _ in range(repeat):
+        for x in inputs:
+            start = time.perf_counter()
+            fn(x)
+            timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1e6
+    return {
+        'calls': len(timings),
+        'mean_us': float(timings.mean()),
+        'p50_us': float(np.percentile(timings, 50)),
+        'p95_us': float(np.percentile(timings, 95)),
+        'per_sec': float(1e6 / timings.mean()),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(rows=2000, repeat=3, seed=0):
+    import sklearn
+    import xgboost
+
+    # the app predicts on plain arrays, same as in production; don't spam stderr about it
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    df = synthetic_tweets(rows, seed)
+    workdir = tempfile.mkdtemp(prefix='tie-bench-')
+    start = time.perf_counter()
+    model_path, tfidf_path, company_path = train_small_model(df, workdir, seed)
+    train_seconds = time.perf_counter() - start
+
+    # my_app loads its artifacts at import time
+    os.environ['TIE_MODEL_PATH'] = model_path
+    os.environ['TIE_TFIDF_PATH'] = tfidf_path
+    os.environ['TIE_COMPANY_TABLE_PATH'] = company_path
+    import company_stats
+    import features
+
+    # company_stats loaded its table when train_small_model imported it, before the path was set
+    company_stats.company_index = company_stats.load_company_index(company_path)
+    import my_app
+
+    # otherwise the first request starts warm-up on a background thread, and the app
+    # timings would measure it running alongside them instead of the steady state
+    warmup_seconds = my_app.warm_up()
+
+    texts = df['content'].tolist()[:500]
+    sample = texts[:100]
+    results = {}
+
+    # single-text feature functions
+    results['features.count_emojis'] = measure(features.count_emojis, texts, repeat)
+    results['features.has_url'] = measure(features.has_url, texts, repeat)
+    results['features.has_hashtag'] = measure(features.has_hashtag, texts, repeat)
+    results['features.polarity_uncached'] = measure(features.POLARITY_BACKENDS[features.POLARITY_BACKEND][0], sample)
+    features.polarity_cache.get_many(texts)
+    results['features.get_polarity_cached'] = measure(features.get_polarity, texts, repeat)
+    if my_app.models.active.tfidf_vocab is not None:
+        results['features.tfidf_mean'] = measure(my_app.models.active.tfidf_vocab.tfidf_mean, texts, repeat)
+    results['features.transform_one'] = measure(my_app.feature_extractor.transform_one, texts, repeat)
+    results['app.build_feature_row'] = measure(
+        lambda text: my_app.build_feature_row(text, 'nike', True, 18), texts, repeat)
+
+    # bulk feature path, per call of 500 texts (polarity is cached by now)
+    results['features.text_features_500'] = measure(my_app.feature_extractor.text_features, [texts], repeat * 3)
+
+    # model.predict: one row per call vs batches
+    X = np.array([my_app.build_feature_row(text, 'nike', True, 18) for text in texts])
+    results['predict.single_row'] = measure(lambda i: my_app.models.active.model.predict(X[i:i + 1]), range(200), repeat)
+    for batch_size in (32, 256):
+        batches = [X[i:i + batch_size] for i in range(0, len(X) - batch_size + 1, batch_size)]
+        stats = measure(my_app.models.active.model.predict, batches, repeat * 3)
+        stats['per_row_us'] = stats['mean_us'] / batch_size
+        results[f'predict.batch_{batch_size}'] = stats
+
+    # tweet generator
+    rng = random.Random(seed)
+    tweet_types = my_app.tweet_generator.get_supported_tweet_types()
+    jobs = [(rng.choice(COMPANIES), rng.choice(tweet_types), rng.choice(MESSAGES) or None) for _ in range(1000)]
+    results['generator.generate_tweet'] = measure(
+        lambda job: my_app.tweet_generator.generate_tweet(job[0], job[1], job[2], job[2]), jobs, repeat)
+
+    # end to end through Flask's test client
+    client = my_app.app.test_client()
+    forms = [{'company': company.lower(), 'tweet_type': tweet_type, 'message': message or '',
+              'hour': str(rng.randrange(24)), **({'has_media': 'on'} if rng.random() < 0.5 else {})}
+             for company, tweet_type, message in jobs[:200]]
+    results['app.home_get'] = measure(lambda _: client.get('/'), range(100), repeat)
+    results['app.home_post'] = measure(lambda form: client.post('/', data=form), forms, repeat)
+    api_jobs = [{'company': form['company'], 'tweet_type': form['tweet_type'], 'message': form['message'],
+                 'hour': int(form['hour'])} for form in forms]
+    api_batches = [api_jobs[i:i + 32] for i in range(0, len(api_jobs) - 31, 32)]
+    stats = measure(lambda batch: client.post('/api/predict', json=batch), api_batches, repeat * 3)
+    stats['per_row_us'] = stats['mean_us'] / 32
+    results['app.api_predict_32'] = stats
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__,
+            'xgboost': xgboost.__version__,
+            'rows': rows,
+            'repeat': repeat,
+            'train_seconds': train_seconds,
+            'warmup_seconds': warmup_seconds,
+            'model': type(my_app.models.active.model).__name__,
+            'settings': {key: value for key, value in os.environ.items()
+                         if key.startswith('TIE_')
+                         and key not in ('TIE_MODEL_PATH', 'TIE_TFIDF_PATH', 'TIE_COMPANY_TABLE_PATH')},
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Prints mean latency against a baseline report; returns the benchmarks slower than threshold x"""
+    regressions = []
+    for name, stats in report['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        ratio = stats['mean_us'] / before['mean_us']
+        flag = ''
+        if ratio > threshold:
+            regressions.append(name)
+            flag = '  <-- slower'
+        print(f"{name:32s} {before['mean_us']:12.1f}us -> {stats['mean_us']:12.1f}us  x{ratio:5.2f}{flag}",
+              file=sys.stderr)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark features, model inference and the Flask app.')
+    parser.add_argument('--rows', type=int, default=2000, help='synthetic tweets to train on')
+    parser.add_argument('--repeat', type=int, default=3, help='passes over each benchmark input')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON report here (default: stdout)')
+    parser.add_argument('--compare', help='baseline JSON report to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='with --compare, fail when mean latency grows by more than this factor')
+    args = parser.parse_args()
+
+    report = run(rows=args.rows, repeat=args.repeat, seed=args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than x{args.threshold}: {', '.join(regressions)}",
+                  file=sys.stderr)
+            sys.exit(1)
@@ -0,0 +1,232 @@
+"""Scores a large CSV or Parquet archive of tweets with like_predictor.pkl.
+
+    python bulk_score.py tweets.parquet predictions/ --jobs 8
+
+The input is read in chunks of --chunksize rows. Each chunk is turned into features
+and predicted by one worker process (one vectorized predict per chunk), and the worker
+writes it to predictions/part-000123.parquet. Only about 2 x --jobs chunks are in memory
+at once, so memory stays flat no matter how big the archive is. The output directory
+reads back as one table with pd.read_parquet('predictions/').
+
+Rerunning the same command resumes: chunks whose part file already exists are skipped.
+A manifest in the output directory keeps a different input or chunk size, or a retrained
+model, TF-IDF vocabulary or company table (their SHA-256 is recorded), from mixing into
+the same output.
+
+Features are computed the same way as in training (SJ_model_week3.py): stripped and
+lower-cased content, has_media from the media column, hour from the date column. The
+company columns come from the company table training wrote (--company-table); a
+missing table is an error rather than a silent switch to the five-name sample table.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from company_stats import COMPANY_TABLE_PATH, CompanyIndex, sample_index
+from compiled_model import CompiledStackingModel
+from data_ingest import read_chunks
+from features import FeatureExtractor
+from model_bundle import file_digest
+from tfidf import TfidfVocabulary
+
+MANIFEST = '_manifest.json'
+
+# set in each worker by _init_worker
+_model = None
+_tfidf_vocab = None
+_company_index = None
+_extractor = None
+
+
+def load_model(model_path, compiled=False):
+    model = joblib.load(model_path)
+    if compiled and not isinstance(model, CompiledStackingModel):
+        model = CompiledStackingModel(model)
+    # the pool already uses every core, so keep each worker's predict single-threaded
+    for estimator in getattr(model, 'estimators_', []):
+        if hasattr(estimator, 'n_jobs'):
+            estimator.n_jobs = 1
+    return model
+
+
+def _init_worker(model_path, tfidf_path, company_table_path, compiled):
+    global _model, _tfidf_vocab, _company_index, _extractor
+    _model = load_model(model_path, compiled)
+    _tfidf_vocab = TfidfVocabulary.load(tfidf_path) if tfidf_path and os.path.exists(tfidf_path) else None
+    # run() already refused a company table path that doesn't exist
+    _company_index = CompanyIndex.load(company_table_path) if company_table_path else sample_index()
+    _extractor = FeatureExtractor()
+
+
+def chunk_features(chunk, columns):
+    """FEATURE_COLUMNS for one input chunk"""
+    content = chunk[columns['text']].fillna('').astype(str).str.strip().str.lower()
+    if columns['media']:
+        has_media = (chunk[columns['media']].fillna('no_media') != 'no_media').to_numpy()
+    else:
+        has_media = False
+    if columns['date']:
+        # rows without a usable date get noon, like the app's default
+        hour = pd.to_datetime(chunk[columns['date']], errors='coerce').dt.hour.fillna(12).astype(np.int64).to_numpy()
+    else:
+        hour = 12
+    if columns['company']:
+        company_encoded, company_avg_likes = _company_index.lookup_many(chunk[columns['company']])
+    else:
+        company_encoded, company_avg_likes = _company_index.lookup_many([''] * len(chunk))
+    tfidf_mean = _tfidf_vocab.tfidf_means(content) if _tfidf_vocab is not None else 0.1
+    return _extractor.transform(
+        content,
+        has_media=has_media,
+        hour=hour,
+        company_encoded=company_encoded,
+        company_avg_likes=company_avg_likes,
+        tfidf_mean=tfidf_mean,
+    )
+
+
+def score_chunk(index, first_row, chunk, columns, out_dir):
+    """Predicts one chunk and writes its part file; returns (index, rows)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    predictions = _model.predict(chunk_features(chunk, columns))
+    out = pd.DataFrame({'row': np.arange(first_row, first_row + len(chunk), dtype=np.int64)})
+    if columns['id']:
+        out[columns['id']] = chunk[columns['id']].to_numpy()
+    out['predicted_likes'] = np.asarray(predictions, dtype=np.float32)
+
+    path = part_path(out_dir, index)
+    tmp_path = path + '.tmp'
+    pq.write_table(pa.Table.from_pandas(out, preserve_index=False), tmp_path)
+    # a part file only ever appears complete, so an interrupted chunk is simply redone
+    os.replace(tmp_path, path)
+    return index, len(chunk)
+
+
+def part_path(out_dir, index):
+    return os.path.join(out_dir, f'part-{index:06d}.parquet')
+
+
+def check_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    if os.path.exists(path):
+        with open(path) as f:
+            existing = json.load(f)
+        if existing != manifest:
+            changed = sorted(key for key in set(existing) | set(manifest) if existing.get(key) != manifest.get(key))
+            raise SystemExit(f'{out_dir} holds output of a different run ({", ".join(changed)} changed); '
+                             'use a new output directory or delete it')
+    else:
+        with open(path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+
+def optional_digest(path):
+    return file_digest(path) if path and os.path.exists(path) else None
+
+
+def run(input_path, out_dir, columns, model_path='like_predictor.pkl', tfidf_path='tfidf_vocab.npz',
+        company_table_path=COMPANY_TABLE_PATH, chunksize=100_000, jobs=None, compiled=False, log=sys.stderr):
+    """Scores input_path into out_dir; returns {'rows', 'chunks', 'skipped_chunks', 'seconds', 'rows_per_sec'}
+
+    company_table_path None (or '') scores with the five-name sample table.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if company_table_path and not os.path.exists(company_table_path):
+        raise SystemExit(f"{company_table_path} not found; pass the table training wrote with --company-table, "
+                         "or --company-table '' for the sample table")
+    os.makedirs(out_dir, exist_ok=True)
+    stat = os.stat(input_path)
+    check_manifest(out_dir, {
+        'input': os.path.abspath(input_path),
+        'input_size': stat.st_size,
+        'input_mtime': int(stat.st_mtime),
+        'chunksize': chunksize,
+        'columns': columns,
+        # a part file is only comparable with the others if the same artifacts scored it
+        'model_sha256': file_digest(model_path),
+        'tfidf_sha256': optional_digest(tfidf_path),
+        'company_table_sha256': optional_digest(company_table_path),
+    })
+    read_columns = list(dict.fromkeys(column for column in columns.values() if column))
+
+    start = time.perf_counter()
+    scored_rows = 0
+    skipped = 0
+    chunks = 0
+
+    def report(final=False):
+        elapsed = time.perf_counter() - start
+        rate = scored_rows / elapsed if elapsed > 0 else 0.0
+        print(f"{'done: ' if final else ''}{scored_rows:,} rows scored in {elapsed:.1f}s "
+              f"({rate:,.0f} rows/s), {skipped} chunk(s) already done", file=log)
+        return elapsed, rate
+
+    with ProcessPoolExecutor(jobs, initializer=_init_worker,
+                             initargs=(model_path, tfidf_path, company_table_path or None, compiled)) as pool:
+        pending = set()
+        first_row = 0
+        for index, chunk in enumerate(read_chunks(input_path, read_columns, chunksize)):
+            chunks += 1
+            if os.path.exists(part_path(out_dir, index)):
+                skipped += 1
+            else:
+                # bounded read-ahead keeps memory flat
+                while len(pending) >= 2 * jobs:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    scored_rows += sum(future.result()[1] for future in done)
+                    report()
+                pending.add(pool.submit(score_chunk, index, first_row, chunk, columns, out_dir))
+            first_row += len(chunk)
+        for future in pending:
+            scored_rows += future.result()[1]
+
+    elapsed, rate = report(final=True)
+    return {'rows': scored_rows, 'chunks': chunks, 'skipped_chunks': skipped,
+            'seconds': elapsed, 'rows_per_sec': rate}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Score a CSV/Parquet tweet archive with the like predictor.')
+    parser.add_argument('input', help='.csv or .parquet file')
+    parser.add_argument('output', help='directory for the part-*.parquet prediction files')
+    parser.add_argument('--model', default=os.environ.get('TIE_MODEL_PATH', 'like_predictor.pkl'))
+    parser.add_argument('--tfidf', default=os.environ.get('TIE_TFIDF_PATH', 'tfidf_vocab.npz'))
+    parser.add_argument('--company-table', default=COMPANY_TABLE_PATH,
+                        help="company_table.npz from training ('' for the five-name sample table)")
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--compiled', action='store_true',
+                        help='predict with the flat-array evaluator from compiled_model.py')
+    parser.add_argument('--text-column', default='content')
+    parser.add_argument('--company-column', default='inferred company', help="'' if there is none")
+    parser.add_argument('--media-column', default='media', help="'' if there is none")
+    parser.add_argument('--date-column', default='date', help="'' if there is none")
+    parser.add_argument('--id-column', default='', help='copied into the output next to each prediction')
+    args = parser.parse_args()
+
+    run(
+        args.input,
+        args.output,
+        columns={
+            'text': args.text_column,
+            'company': args.company_column or None,
+            'media': args.media_column or None,
+            'date': args.date_column or None,
+            'id': args.id_column or None,
+        },
+        model_path=args.model,
+        tfidf_path=args.tfidf,
+        company_table_path=args.company_table,
+        chunksize=args.chunksize,
+        jobs=args.jobs,
+        compiled=args.compiled,
+    )
@@ -0,0 +1,143 @@
+"""company_encoded / company_avg_likes for serving, from the table training exported.
+
+SJ_model_week3.py (and incremental.py, when it promotes an update) write company_table.npz:
+every company's normalized name, the label code the model was trained with and its
+average likes. CompanyIndex keeps the names in one dict (name -> row) and the numbers in
+arrays, so a lookup is a single dict probe plus two list reads; 50,000 brands take about
+10 MB. Unknown companies get UNKNOWN_COMPANY_CODE and the overall average likes from
+training.
+
+Without the file (no retrain since this was added) the old hard-coded sample table is used.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+# what unknown companies get
+UNKNOWN_COMPANY_CODE = 0
+DEFAULT_AVG_LIKES = 100
+
+COMPANY_TABLE_PATH = os.environ.get('TIE_COMPANY_TABLE_PATH', 'company_table.npz')
+
+# Dummy company table - radded some samples
+SAMPLE_AVG_LIKES = {
+    'nike': 150,
+    'starbucks': 100,
+    'apple': 200,
+    'tesla': 180,
+    'our company': 120
+}
+
+
+def normalize_company(name):
+    """Lower-cased with runs of whitespace collapsed, so 'Nike ' and 'nike' are one brand"""
+    return ' '.join(str(name).split()).lower()
+
+
+class CompanyIndex:
+    """Normalized company name -> (code, average likes), backed by flat arrays"""
+
+    def __init__(self, names, codes, avg_likes, counts=None, default_avg_likes=DEFAULT_AVG_LIKES):
+        self.rows = {name: row for row, name in enumerate(names)}
+        self.codes = np.asarray(codes, dtype=np.int32)
+        self.avg_likes = np.asarray(avg_likes, dtype=np.float64)
+        self.counts = np.zeros(len(self.rows), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self.default_avg_likes = float(default_avg_likes)
+        # python numbers are faster than numpy scalars for one lookup at a time
+        self._codes_list = self.codes.tolist()
+        self._avg_likes_list = self.avg_likes.tolist()
+
+    @classmethod
+    def from_table(cls, table):
+        """From {company: {'code', 'avg_likes', 'count'}} (streaming_features' meta.json layout).
+
+        Names that only differ in case/whitespace become one entry, the one with the most
+        rows wins. Companies without any usable rows are left out.
+        """
+        best = {}
+        for company, entry in table.items():
+            if not entry.get('count') or entry.get('avg_likes') is None:
+                continue
+            name = normalize_company(company)
+            if name not in best or entry['count'] > best[name]['count']:
+                best[name] = entry
+        names = sorted(best)
+        counts = [best[name]['count'] for name in names]
+        avg_likes = [best[name]['avg_likes'] for name in names]
+        total = sum(counts)
+        return cls(
+            names,
+            [best[name]['code'] for name in names],
+            avg_likes,
+            counts,
+            # the average over all training rows, not over companies
+            sum(a * c for a, c in zip(avg_likes, counts)) / total if total else DEFAULT_AVG_LIKES,
+        )
+
+    @classmethod
+    def from_frame(cls, df, company='inferred company', code='company_encoded', avg_likes='company_avg_likes'):
+        """From the training DataFrame, which has the code and average likes on every row"""
+        grouped = df.groupby(company, observed=True).agg(
+            code=(code, 'first'), avg_likes=(avg_likes, 'first'), count=(code, 'size'))
+        return cls.from_table(grouped.to_dict('index'))
+
+    def save(self, path):
+        # normalized names can't contain a newline, so they are stored as one byte buffer
+        np.savez(
+            path,
+            names=np.frombuffer('\n'.join(self.rows).encode('utf-8'), dtype=np.uint8),
+            codes=self.codes,
+            avg_likes=self.avg_likes,
+            counts=self.counts,
+            default_avg_likes=np.array(self.default_avg_likes),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            raw = data['names'].tobytes().decode('utf-8')
+            return cls(raw.split('\n') if raw else [], data['codes'], data['avg_likes'], data['counts'],
+                       float(data['default_avg_likes']))
+
+    def lookup(self, company):
+        """(company_encoded, company_avg_likes) for one company name"""
+        row = self.rows.get(company)
+        if row is None:
+            row = self.rows.get(normalize_company(company))
+            if row is None:
+                return UNKNOWN_COMPANY_CODE, self.default_avg_likes
+        return self._codes_list[row], self._avg_likes_list[row]
+
+    def lookup_many(self, companies):
+        """lookup() for a whole column at once, as two arrays"""
+        companies = pd.Series(companies).astype(str).str.split().str.join(' ').str.lower()
+        rows = companies.map(self.rows)
+        known = rows.notna().to_numpy()
+        rows = rows.fillna(0).to_numpy(dtype=np.intp)
+        codes = np.where(known, self.codes[rows] if self.rows else 0, UNKNOWN_COMPANY_CODE).astype(np.int64)
+        avg_likes = np.where(known, self.avg_likes[rows] if self.rows else 0.0, self.default_avg_likes)
+        return codes, avg_likes
+
+
+def sample_index():
+    # the old dummy: LabelEncoder codes of the five sample names
+    names = sorted(SAMPLE_AVG_LIKES)
+    return CompanyIndex(names, range(len(names)), [SAMPLE_AVG_LIKES[name] for name in names])
+
+
+def load_company_index(path=COMPANY_TABLE_PATH):
+    return CompanyIndex.load(path) if os.path.exists(path) else sample_index()
+
+
+company_index = load_company_index()
+
+
+def company_features(company):
+    """(company_encoded, company_avg_likes) for one company name"""
+    return company_index.lookup(company)
+
+
+def company_features_many(companies):
+    """company_features() for a whole column at once, as two arrays"""
+    return company_index.lookup_many(companies)
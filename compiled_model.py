@@ -0,0 +1,228 @@
+import json
+
+import joblib
+import numpy as np
+
+# XGBoost objectives whose prediction is just base_score + sum of leaves
+IDENTITY_OBJECTIVES = {'reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror'}
+
+
+class TreeEnsemble:
+    """Every tree of a forest or booster flattened into one set of node arrays.
+
+    Leaves point at themselves, so walking `depth` levels from the roots always ends
+    on a leaf no matter how deep each individual tree is. A split sends a row left when
+    x <= threshold (XGBoost's strict x < t is folded into the threshold when exporting),
+    and NaNs go wherever `missing_left` says.
+    """
+
+    def __init__(self, feature, threshold, children, missing_left, value, roots, depth,
+                 scale=1.0, offset=0.0):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.scale = scale
+        self.offset = offset
+
+    @classmethod
+    def from_trees(cls, trees, scale=1.0, offset=0.0):
+        """Builds an ensemble from per-tree (feature, threshold, left, right, missing_left, value) tuples.
+
+        left/right use -1 for "this node is a leaf", node ids are local to each tree.
+        """
+        features, thresholds, children, missing, values, roots = [], [], [], [], [], []
+        depth = 0
+        start = 0
+        for feature, threshold, left, right, missing_left, value in trees:
+            n_nodes = len(feature)
+            own = np.arange(n_nodes)
+            is_leaf = left < 0
+            children.append(np.stack([
+                np.where(is_leaf, own, left) + start,
+                np.where(is_leaf, own, right) + start,
+            ], axis=1))
+            features.append(np.where(is_leaf, 0, feature))
+            thresholds.append(np.where(is_leaf, 0.0, threshold))
+            missing.append(missing_left)
+            values.append(value)
+            roots.append(start)
+            depth = max(depth, _tree_depth(left, right))
+            start += n_nodes
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children=np.concatenate(children).astype(np.intp),
+            missing_left=np.concatenate(missing).astype(bool),
+            value=np.concatenate(values).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            depth=depth,
+            scale=scale,
+            offset=offset,
+        )
+
+    def leaves(self, X):
+        """Returns the leaf index each row lands on in each tree, shape (n_rows, n_trees)"""
+        nodes = np.repeat(self.roots[None, :], X.shape[0], axis=0)
+        rows = np.arange(X.shape[0])[:, None]
+        for _ in range(self.depth):
+            x = X[rows, self.feature[nodes]]
+            go_right = ~(x <= self.threshold[nodes])
+            missing = np.isnan(x)
+            if missing.any():
+                go_right[missing] = ~self.missing_left[nodes[missing]]
+            next_nodes = self.children[nodes, go_right.view(np.int8)]
+            if np.array_equal(next_nodes, nodes):
+                break
+            nodes = next_nodes
+        return nodes
+
+    def predict(self, X):
+        return self.offset + self.scale * self.value[self.leaves(X)].sum(axis=1)
+
+
+class LinearModel:
+    """coef_ . x + intercept_ for any fitted sklearn linear regressor"""
+
+    def __init__(self, coef, intercept):
+        self.coef = np.asarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(np.ravel(intercept)[0])
+
+    def predict(self, X):
+        return X @ self.coef + self.intercept
+
+
+def _tree_depth(left, right):
+    depth = np.zeros(len(left), dtype=np.intp)
+    # parents always come before their children in both sklearn and xgboost layouts
+    for node in range(len(left)):
+        if left[node] >= 0:
+            depth[left[node]] = depth[right[node]] = depth[node] + 1
+    return int(depth.max())
+
+
+def _export_sklearn_tree(tree):
+    tree = tree.tree_
+    missing_left = getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=bool))
+    return (tree.feature, tree.threshold, tree.children_left, tree.children_right,
+            missing_left, tree.value[:, 0, 0])
+
+
+def _export_xgb_tree(tree):
+    left = np.asarray(tree['left_children'], dtype=np.intp)
+    right = np.asarray(tree['right_children'], dtype=np.intp)
+    conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+    # xgboost compares float32 inputs with x < t; x <= previous float32 below t is the same test
+    threshold = np.nextafter(conditions, np.float32(-np.inf)).astype(np.float64)
+    # leaves keep their value in split_conditions
+    value = np.where(left < 0, conditions, 0.0)
+    return (np.asarray(tree['split_indices'], dtype=np.intp), threshold, left, right,
+            np.asarray(tree['default_left'], dtype=bool), value)
+
+
+def _parse_base_score(raw):
+    # newer xgboost writes it as a one-element vector, e.g. "[6.4633685E2]"
+    return float(str(raw).strip('[]').split(',')[0])
+
+
+def compile_estimator(estimator):
+    """Returns a TreeEnsemble/LinearModel that predicts like `estimator`, or raises TypeError"""
+    if hasattr(estimator, 'tree_'):
+        return TreeEnsemble.from_trees([_export_sklearn_tree(estimator)])
+
+    if hasattr(estimator, 'estimators_') and all(hasattr(tree, 'tree_') for tree in estimator.estimators_):
+        trees = [_export_sklearn_tree(tree) for tree in estimator.estimators_]
+        return TreeEnsemble.from_trees(trees, scale=1.0 / len(trees))
+
+    if hasattr(estimator, 'get_booster'):
+        booster = estimator.get_booster()
+        config = json.loads(booster.save_raw('json'))['learner']
+        objective = config['objective']['name']
+        if objective not in IDENTITY_OBJECTIVES:
+            raise TypeError(f"Can't compile XGBoost objective {objective!r}")
+        model = config['gradient_booster']
+        if model['name'] != 'gbtree':
+            raise TypeError(f"Can't compile XGBoost booster {model['name']!r}")
+        trees = model['model']['trees']
+        # predict() stops at best_iteration when the model was fit with early stopping
+        best_iteration = booster.attr('best_iteration')
+        if best_iteration is not None:
+            trees = trees[:model['model']['iteration_indptr'][int(best_iteration) + 1]]
+        base_score = _parse_base_score(config['learner_model_param']['base_score'])
+        return TreeEnsemble.from_trees([_export_xgb_tree(tree) for tree in trees], offset=base_score)
+
+    if hasattr(estimator, 'coef_') and hasattr(estimator, 'intercept_'):
+        return LinearModel(estimator.coef_, estimator.intercept_)
+
+    raise TypeError(f"Don't know how to compile {type(estimator).__name__}")
+
+
+class CompiledStackingModel:
+    """Drop-in predict() for the pickled StackingRegressor without sklearn/xgboost in the hot path.
+
+    The RandomForest and XGBoost base learners are exported to flat node arrays and the
+    LinearRegression final estimator is applied by hand. Rows are cast to float32 like
+    both libraries do before walking their trees.
+
+    model_sha256 is the SHA-256 of the pickled model file it was compiled from, so a
+    saved artifact can be checked against the model it is served next to (check_model).
+    """
+
+    def __init__(self, model, model_sha256=None):
+        if any(method != 'predict' for method in model.stack_method_):
+            raise TypeError('Only regressors stacked on predict() can be compiled')
+        self.base_models = [compile_estimator(est) for est in model.estimators_]
+        self.final_model = compile_estimator(model.final_estimator_)
+        self.passthrough = model.passthrough
+        self.n_features_in_ = model.n_features_in_
+        self.model_sha256 = model_sha256
+
+    @classmethod
+    def load(cls, path='like_predictor.pkl'):
+        return cls(joblib.load(path))
+
+    def save(self, path):
+        """Writes an uncompressed artifact that load_mmap() can memory-map"""
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load_mmap(path):
+        """Loads a save()d model with every node array memory-mapped read-only.
+
+        The arrays then live in the OS page cache, so all gunicorn workers on the host
+        share one copy instead of each unpickling its own.
+        """
+        return joblib.load(path, mmap_mode='r')
+
+    def check_model(self, model_sha256):
+        """Raises ValueError unless this was compiled from the model file with that SHA-256"""
+        # artifacts saved before model_sha256 existed can't be trusted either
+        compiled_from = getattr(self, 'model_sha256', None)
+        if compiled_from != model_sha256:
+            raise ValueError(f'the compiled model was built from model {compiled_from or "(unknown)"}, '
+                             f'not {model_sha256}; write it again with TIE_MMAP_ARTIFACT=1')
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        stacked = np.column_stack([base.predict(X) for base in self.base_models])
+        if self.passthrough:
+            stacked = np.hstack([stacked, X])
+        return self.final_model.predict(stacked)
+
+    def verify(self, model, X, rtol=1e-4, atol=1e-2):
+        """Raises ValueError unless predict(X) matches model.predict(X) within tolerance.
+
+        Returns the largest absolute difference seen.
+        """
+        expected = model.predict(np.asarray(X))
+        actual = self.predict(X)
+        if not np.allclose(actual, expected, rtol=rtol, atol=atol):
+            worst = float(np.max(np.abs(actual - expected)))
+            raise ValueError(f'Compiled model differs from the original by up to {worst}')
+        return float(np.max(np.abs(actual - expected)))
@@ -0,0 +1,259 @@
+"""Local columnar cache for the tweet dataset.
+
+Training used to call pd.read_csv() on the Google Sheets export every run. load_dataset()
+parses a CSV (local path or URL) once, with proper dtypes, and stores it as Parquet under
+TIE_DATA_CACHE_DIR named by the SHA-256 of the raw CSV. An index.json there remembers
+which hash each source had last time, so:
+
+- a local file is only re-parsed when its content changes (size/mtime are checked
+  first, so unchanged files aren't even re-hashed)
+- a URL is downloaded once and then served from the cache until refresh=True
+  (TIE_DATA_REFRESH=1), which is what lets training run on offline machines
+
+Each source keeps one snapshot: a new one deletes the copy it supersedes. Rows read
+later from the end of a source (incremental.py) go to one appended file next to the
+snapshot (append_rows), so keeping the cache current costs only the new rows.
+
+    python data_ingest.py [path-or-url] [--refresh]
+"""
+import hashlib
+import io
+import json
+import os
+import sys
+import urllib.request
+
+import pandas as pd
+
+SHEET_ID = "1JcESl7qCCBvS6xpWMZplhCXunvmkcNU_"
+GID = "95254209"
+SHEET_URL = f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/export?format=csv&gid={GID}"
+
+# the columns SJ_model_week3.py needs
+TRAINING_COLUMNS = ['content', 'username', 'inferred company', 'likes', 'media', 'date']
+# few distinct values and lots of repeats
+CATEGORICAL_COLUMNS = ['username', 'inferred company']
+
+
+def is_url(source):
+    return source.startswith(('http://', 'https://'))
+
+
+def cache_dir():
+    return os.environ.get('TIE_DATA_CACHE_DIR', '.tie_data_cache')
+
+
+def _read_index(directory):
+    try:
+        with open(os.path.join(directory, 'index.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(directory, index):
+    path = os.path.join(directory, 'index.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _key(source):
+    return source if is_url(source) else os.path.abspath(source)
+
+
+def _read_raw(source):
+    if is_url(source):
+        with urllib.request.urlopen(source) as response:
+            return response.read()
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def read_raw_from(source, start=0):
+    """(the bytes of `source` from byte `start` on, its total size in bytes)
+
+    A local file is read from `start`. A URL (the sheet export can't be asked for a
+    byte range) is downloaded whole and sliced.
+    """
+    if is_url(source):
+        raw = _read_raw(source)
+        return raw[start:], len(raw)
+    with open(source, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(start)
+        return f.read(), size
+
+
+def parse_csv(raw):
+    """Raw CSV bytes -> DataFrame with typed columns"""
+    return type_columns(pd.read_csv(io.BytesIO(raw)))
+
+
+def type_columns(df):
+    if 'likes' in df:
+        df['likes'] = pd.to_numeric(df['likes'], errors='coerce')
+    if 'date' in df:
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    for column in CATEGORICAL_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype('category')
+    return df
+
+
+def cache_path(digest, directory=None):
+    return os.path.join(directory or cache_dir(), f'{digest}.parquet')
+
+
+def appended_path(source, directory=None):
+    """Where the rows appended to `source`'s snapshot go, one file per source"""
+    name = hashlib.sha256(_key(source).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(directory or cache_dir(), f'appended-{name}.parquet')
+
+
+def cache_files(source, digest, directory=None):
+    """The Parquet files holding `source`'s cached rows, in order"""
+    appended = appended_path(source, directory)
+    return [cache_path(digest, directory)] + ([appended] if os.path.exists(appended) else [])
+
+
+def cached_digest(source, directory=None, refresh=False):
+    """Hash of the cached copy of `source` if it is still current, else None (reads nothing big)"""
+    directory = directory or cache_dir()
+    entry = _read_index(directory).get(_key(source))
+    if not entry or refresh or not os.path.exists(cache_path(entry['sha256'], directory)):
+        return None
+    if is_url(source):
+        return entry['sha256']
+    stat = os.stat(source)
+    if entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+        return entry['sha256']
+    return None
+
+
+def ingest(source, directory=None, refresh=False):
+    """Makes sure `source` is in the cache and returns its content hash"""
+    directory = directory or cache_dir()
+    digest = cached_digest(source, directory, refresh)
+    if digest is not None:
+        return digest
+    return store(source, _read_raw(source), directory)
+
+
+def store(source, raw, directory=None):
+    """Caches `raw`, all of `source`, as its snapshot and returns its hash.
+
+    The snapshot it replaces, and the rows appended to that one, are deleted (unless
+    another source has the same content), so a source never has more than one copy.
+    """
+    directory = directory or cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    index = _read_index(directory)
+    digest = hashlib.sha256(raw).hexdigest()
+    path = cache_path(digest, directory)
+    if not os.path.exists(path):
+        parse_csv(raw).to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+    # the size read, not the size now: if the file grew meanwhile, the check in
+    # cached_digest() fails and the next read takes a new snapshot
+    entry = {'sha256': digest, 'size': len(raw)}
+    if not is_url(source):
+        entry['mtime_ns'] = os.stat(source).st_mtime_ns
+    previous = index.get(_key(source))
+    index[_key(source)] = entry
+    _write_index(directory, index)
+
+    if os.path.exists(appended_path(source, directory)):
+        os.remove(appended_path(source, directory))
+    if previous and previous['sha256'] not in {other['sha256'] for other in index.values()}:
+        try:
+            os.remove(cache_path(previous['sha256'], directory))
+        except FileNotFoundError:
+            pass
+    return digest
+
+
+def cached_size(source, directory=None):
+    """How many bytes of `source` its cached rows cover, None when nothing is cached"""
+    directory = directory or cache_dir()
+    entry = _read_index(directory).get(_key(source))
+    if not entry or 'size' not in entry or not os.path.exists(cache_path(entry['sha256'], directory)):
+        return None
+    return entry['size']
+
+
+def append_rows(source, rows, size, directory=None):
+    """Adds `rows` to `source`'s cached copy: the rows from byte cached_size(source) to `size`.
+
+    They go to the source's one appended file, so this costs the rows added since the
+    snapshot, not the whole history.
+    """
+    directory = directory or cache_dir()
+    index = _read_index(directory)
+    entry = index[_key(source)]
+    path = appended_path(source, directory)
+    if os.path.exists(path):
+        rows = pd.concat([pd.read_parquet(path), rows], ignore_index=True)
+    for column in CATEGORICAL_COLUMNS:
+        if column in rows:
+            rows[column] = rows[column].astype('category')
+    rows.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+
+    entry['size'] = size
+    if not is_url(source):
+        entry['mtime_ns'] = os.stat(source).st_mtime_ns
+    _write_index(directory, index)
+
+
+def read_chunks(path, columns, chunksize):
+    """Yields DataFrames of at most chunksize rows with just `columns` from a CSV or Parquet file"""
+    if path.endswith(('.parquet', '.parq', '.pq')):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+
+
+def iter_dataset(source=None, columns=None, chunksize=100_000, directory=None):
+    """load_dataset() in chunks, for data that doesn't fit in memory.
+
+    Streams from the Parquet cache when `source` is already cached there, otherwise
+    straight from the CSV (typed chunk by chunk; nothing is cached in that case).
+    """
+    source = source or os.environ.get('TIE_DATA_SOURCE') or SHEET_URL
+    digest = cached_digest(source, directory)
+    if digest is not None:
+        for path in cache_files(source, digest, directory):
+            yield from read_chunks(path, columns, chunksize)
+    else:
+        for chunk in read_chunks(source, columns, chunksize):
+            yield type_columns(chunk)
+
+
+def load_dataset(source=None, columns=None, directory=None, refresh=None):
+    """The tweet dataset as a DataFrame, from the local cache whenever possible.
+
+    source defaults to TIE_DATA_SOURCE, then the Google Sheets export. Only `columns`
+    are read from the Parquet file (all of them when None).
+    """
+    source = source or os.environ.get('TIE_DATA_SOURCE') or SHEET_URL
+    if refresh is None:
+        refresh = os.environ.get('TIE_DATA_REFRESH') == '1'
+    digest = ingest(source, directory, refresh)
+    parts = [pd.read_parquet(path, columns=columns) for path in cache_files(source, digest, directory)]
+    if len(parts) == 1:
+        return parts[0]
+    # the categories differ between the snapshot and the appended rows
+    return type_columns(pd.concat(parts, ignore_index=True))
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != '--refresh']
+    source = args[0] if args else os.environ.get('TIE_DATA_SOURCE') or SHEET_URL
+    df = load_dataset(source, refresh='--refresh' in sys.argv)
+    print(f"{source} -> {', '.join(cache_files(source, ingest(source)))} ({len(df):,} rows)")
+    print(df.dtypes.to_string())
@@ -0,0 +1,200 @@
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from textblob import TextBlob
+
+# the regexes live in lexical_scan.py with the one-pass scanner that uses them
+from lexical_scan import EMOJI_PATTERN, HASHTAG_PATTERN, URL_PATTERN, scan, scan_many
+from lexicon_sentiment import lexicon_polarities, lexicon_polarity
+from sentiment_cache import PolarityCache
+
+# Column order the model is trained on. Both SJ_model_week3.py and my_app.py build
+# their matrices from this list, so it only has to be right in one place.
+# The two sentiment columns are what pd.get_dummies(..., drop_first=True) used to
+# produce from the Negative/Neutral/Positive labels (Negative is the dropped level).
+FEATURE_COLUMNS = [
+    'word_count',
+    'char_count',
+    'has_media',
+    'hour',
+    'company_encoded',
+    'emoji_count',
+    'has_url',
+    'has_hashtag',
+    'tfidf_mean',
+    'company_avg_likes',
+    'sentiment_Neutral',
+    'sentiment_Positive',
+]
+
+def textblob_polarity(text):
+    return TextBlob(str(text)).sentiment.polarity
+
+# name -> (single text, many texts); the lexicon engine reproduces TextBlob's scores
+# from a precomputed table and scores batches much faster
+POLARITY_BACKENDS = {
+    'textblob': (textblob_polarity, None),
+    'lexicon': (lexicon_polarity, lexicon_polarities),
+}
+
+# TIE_SENTIMENT_BACKEND picks the backend used by get_polarity() and text_features()
+POLARITY_BACKEND = os.environ.get('TIE_SENTIMENT_BACKEND', 'textblob')
+if POLARITY_BACKEND not in POLARITY_BACKENDS:
+    raise ValueError(f"Unknown TIE_SENTIMENT_BACKEND {POLARITY_BACKEND!r}, expected one of {list(POLARITY_BACKENDS)}")
+
+# generated tweets repeat a lot (24 templates), so polarity goes through a bounded LRU;
+# TIE_POLARITY_CACHE_PATH adds a SQLite store shared by training runs and app workers
+polarity_cache = PolarityCache(
+    POLARITY_BACKENDS[POLARITY_BACKEND][0],
+    maxsize=int(os.environ.get('TIE_POLARITY_CACHE_SIZE', 10000)),
+    path=os.environ.get('TIE_POLARITY_CACHE_PATH') or None,
+    compute_many=POLARITY_BACKENDS[POLARITY_BACKEND][1],
+    table='polarity' if POLARITY_BACKEND == 'textblob' else f'polarity_{POLARITY_BACKEND}',
+)
+
+def get_polarity(text, backend=None):
+    # the configured backend is cached, asking for another one computes it directly
+    if backend is None or backend == POLARITY_BACKEND:
+        return polarity_cache.get(text)
+    return POLARITY_BACKENDS[backend][0](text)
+
+def get_sentiment(polarity):
+    if polarity > 0:
+        return 'Positive'
+    elif polarity < 0:
+        return 'Negative'
+    else:
+        return 'Neutral'
+
+def encode_sentiment(sentiment_str):
+    # (sentiment_Neutral, sentiment_Positive), Negative is the all-zero baseline
+    if sentiment_str == "Positive":
+        return (0, 1)
+    elif sentiment_str == "Neutral":
+        return (1, 0)
+    else:
+        return (0, 0)
+
+# one feature at a time; scan() computes them together and is checked against these
+def count_emojis(text):
+    return len(EMOJI_PATTERN.findall(str(text)))
+
+def has_hashtag(text):
+    # Returns 1 if at least one hashtag is present, else 0
+    return 1 if HASHTAG_PATTERN.search(str(text)) else 0
+
+def has_url(text):
+    return 1 if URL_PATTERN.search(str(text)) else 0
+
+
+class FeatureExtractor:
+    """Turns tweet text (plus context like hour and company stats) into FEATURE_COLUMNS.
+
+    transform_one() is the cheap path for a single online request, transform() is the
+    bulk path for training and batch scoring and uses pandas .str methods instead of
+    row-by-row apply for everything except polarity.
+    """
+
+    columns = FEATURE_COLUMNS
+
+    def transform_one(self, text, has_media=False, hour=12, company_encoded=0,
+                      company_avg_likes=0.0, tfidf_mean=0.0, polarity=None, lexical=None):
+        """Returns one feature row as a plain list in FEATURE_COLUMNS order.
+
+        Pass `polarity` if it was already looked up (e.g. to time it separately), and
+        `lexical` if scan(text) is already known (the tweet generator's skeletons).
+        """
+        text = str(text)
+        if polarity is None:
+            polarity = get_polarity(text)
+        sentiment_neutral, sentiment_positive = encode_sentiment(get_sentiment(polarity))
+        word_count, char_count, emoji_count, hashtag, url = lexical or scan(text)
+        return [
+            word_count,
+            char_count,
+            int(has_media),
+            hour,
+            company_encoded,
+            emoji_count,
+            url,
+            hashtag,
+            tfidf_mean,
+            company_avg_likes,
+            sentiment_neutral,
+            sentiment_positive,
+        ]
+
+    def text_features(self, texts):
+        """Returns the columns that depend only on the text, indexed like `texts`.
+
+        Besides the model columns this also keeps `polarity`, which training uses for EDA.
+        """
+        texts = pd.Series(texts).astype(str).astype(object)
+        polarity = pd.Series(polarity_cache.get_many(texts), index=texts.index, dtype=float)
+        # word_count, char_count, emoji_count, has_hashtag, has_url in one pass per tweet
+        scanned = scan_many(texts.tolist())
+        return pd.DataFrame({
+            'word_count': scanned[:, 0],
+            'char_count': scanned[:, 1],
+            'emoji_count': scanned[:, 2],
+            'has_url': scanned[:, 4],
+            'has_hashtag': scanned[:, 3],
+            'polarity': polarity,
+            'sentiment_Neutral': (polarity == 0).astype(np.int64),
+            'sentiment_Positive': (polarity > 0).astype(np.int64),
+        }, index=texts.index)
+
+    def text_features_parallel(self, texts, jobs=None, min_shard_rows=2000):
+        """text_features() split across a process pool; same output, in the same order.
+
+        The texts are cut into contiguous shards (a few per worker, so one slow shard
+        doesn't hold up the rest), each worker runs the serial text_features() on its
+        shard and the results are concatenated back in input order. jobs=None or <= 0
+        means every core; small inputs just run serially.
+
+        Workers are forked, whatever the platform's default start method is: spawn and
+        forkserver workers re-import the caller's __main__, and SJ_model_week3.py runs
+        its whole training at import. Where there is no fork (Windows) this falls back
+        to the serial path.
+        """
+        texts = pd.Series(texts)
+        if jobs is None or jobs <= 0:
+            jobs = os.cpu_count() or 1
+        n_shards = min(jobs * 4, len(texts) // min_shard_rows)
+        if jobs == 1 or n_shards < 2:
+            return self.text_features(texts)
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            print('text_features_parallel: no fork start method here, running serially', file=sys.stderr)
+            return self.text_features(texts)
+
+        bounds = np.linspace(0, len(texts), n_shards + 1).astype(int)
+        shards = [texts.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+        with ProcessPoolExecutor(min(jobs, n_shards), mp_context=multiprocessing.get_context('fork')) as pool:
+            return pd.concat(list(pool.map(self.text_features, shards)))
+
+    def transform(self, texts, has_media=False, hour=12, company_encoded=0,
+                  company_avg_likes=0.0, tfidf_mean=0.0):
+        """Returns a DataFrame with exactly FEATURE_COLUMNS, one row per text.
+
+        The context arguments can be scalars or array-likes with one value per text;
+        array-likes are taken positionally, not aligned on index.
+        """
+        features = self.text_features(texts)
+        context = {
+            'has_media': has_media,
+            'hour': hour,
+            'company_encoded': company_encoded,
+            'company_avg_likes': company_avg_likes,
+            'tfidf_mean': tfidf_mean,
+        }
+        for column, value in context.items():
+            if np.ndim(value) == 0:
+                features[column] = value
+            else:
+                features[column] = np.asarray(value)
+        features['has_media'] = features['has_media'].astype(np.int64)
+        return features[FEATURE_COLUMNS]
@@ -0,0 +1,43 @@
+import gc
+import os
+import sys
+
+# TIE_PRELOAD=1 loads my_app (and the model) once in the master before forking, so
+# workers start instantly and share the model's memory copy-on-write
+preload_app = os.environ.get('TIE_PRELOAD') == '1'
+
+
+def on_starting(server):
+    # snapshots left in TIE_METRICS_DIR by a previous run would be added to this one's
+    if os.environ.get('TIE_METRICS_DIR'):
+        from metrics import clear_directory
+        clear_directory(os.environ['TIE_METRICS_DIR'])
+
+
+def worker_exit(server, worker):
+    # runs in the worker: write out what happened since its last flush before it's gone
+    app_module = sys.modules.get('my_app')
+    if os.environ.get('TIE_METRICS_DIR') and app_module is not None:
+        app_module.metrics.flush()
+
+
+def child_exit(server, worker):
+    # fold the exited worker's counters into one file, so recycled workers don't leave
+    # a snapshot each behind and a reused pid can't overwrite them
+    if os.environ.get('TIE_METRICS_DIR'):
+        from metrics import mark_process_dead
+        mark_process_dead(worker.pid, os.environ['TIE_METRICS_DIR'])
+
+
+def pre_fork(server, worker):
+    # move everything loaded so far out of the GC's reach; otherwise the collector
+    # touching object headers in a worker dirties those pages and forces a copy
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # the app is loaded by now; warm it before this worker accepts its first connection
+    # so no user request pays the cold-start cost (TIE_WARMUP=0 skips it)
+    if os.environ.get('TIE_WARMUP', '1') != '0':
+        from my_app import warm_up
+        warm_up()
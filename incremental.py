@@ -0,0 +1,343 @@
+"""Cheap daily update of like_predictor.pkl from the tweets added since the last run.
+
+A full retrain (SJ_model_week3.py) reads and refits everything. Once the sheet only grows,
+most of that work repeats. This script keeps a small state file next to the model
+(incremental_state.json) with:
+
+- byte_offset: how much of the source is already in the model, plus a hash of the
+  bytes just before it (tail_digest), so a rewritten sheet is refused rather than
+  silently misread, and the CSV header to parse the rest with
+- the company table: code, like sum and like count per company. Existing codes never
+  change and new companies get the next free code, so the label encodings the trees
+  split on stay valid, and company_avg_likes is updated from the running sums.
+
+An update reads the source from byte_offset on and parses only those bytes. A local CSV
+is read from that offset; the sheet export can't be asked for a byte range, so it is
+downloaded, but only the new bytes are hashed and parsed. The new rows are appended to
+the data cache's copy of the source (data_ingest.append_rows) rather than caching the
+whole history again. It holds out the newest `holdout` fraction of them, but never fewer than
+`min_holdout` rows (and waits for `min_rows` new rows before trying), so a promotion isn't
+decided on a handful of tweets. It continues boosting the XGBoost learner from its previous
+booster on the rest and fits the LinearRegression meta-layer on the base learners'
+out-of-fold predictions for those rows. That fit is blended with the previous
+coefficients, weighted by row count, so one small batch can't replace the blend learned
+from the whole history. The RandomForest and the TF-IDF vocabulary stay as they are (a full retrain
+refreshes them). The updated model replaces the old one only if its RMSE on the held-out
+rows is no worse. Otherwise nothing is advanced, and the next run tries again with those
+rows plus whatever is newer.
+
+    python SJ_model_week3.py              # full retrain, then
+    python incremental.py init            # record what the fresh model was trained on
+    python incremental.py update          # daily; cost follows the number of new rows
+"""
+import argparse
+import copy
+import hashlib
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.model_selection import KFold
+
+from company_stats import CompanyIndex
+from compiled_model import CompiledStackingModel
+from data_ingest import (
+    SHEET_URL,
+    TRAINING_COLUMNS,
+    append_rows,
+    cache_path,
+    cached_size,
+    parse_csv,
+    read_chunks,
+    read_raw_from,
+    store,
+)
+from features import FeatureExtractor
+from model_bundle import file_digest, publish
+from streaming_features import CorpusStats, prepare_chunk
+from tfidf import TfidfVocabulary
+
+
+# how much of the source before byte_offset is hashed to notice a rewritten sheet
+TAIL_BYTES = 4096
+
+
+def state_path():
+    return os.environ.get('TIE_INCREMENTAL_STATE', 'incremental_state.json')
+
+
+def tail_digest(raw):
+    return hashlib.sha256(raw).hexdigest()
+
+
+class CompanyTable:
+    """Running like sums and counts per company, with codes that never change once given out"""
+
+    def __init__(self, entries=None):
+        # {company: {'code', 'like_sum', 'count'}}
+        self.entries = entries or {}
+
+    @classmethod
+    def from_stats(cls, stats):
+        """From a streaming_features.CorpusStats pass; codes match the training LabelEncoder"""
+        return cls({
+            company: {'code': code, 'like_sum': float(stats.like_sums[company]),
+                      'count': int(stats.like_counts[company])}
+            for code, company in enumerate(sorted(stats.companies))
+        })
+
+    def add_companies(self, companies):
+        # like LabelEncoder, every company in the raw rows gets a code, even ones dropna removes later
+        next_code = max((entry['code'] for entry in self.entries.values()), default=-1) + 1
+        for company in sorted(set(pd.Series(companies).dropna().astype(str)) - set(self.entries)):
+            self.entries[company] = {'code': next_code, 'like_sum': 0.0, 'count': 0}
+            next_code += 1
+
+    def add_likes(self, prepared):
+        sums = prepared.groupby('company')['likes'].agg(['sum', 'count'])
+        for company, row in sums.iterrows():
+            self.entries[company]['like_sum'] += float(row['sum'])
+            self.entries[company]['count'] += int(row['count'])
+
+    def codes(self, companies):
+        return companies.map({company: entry['code'] for company, entry in self.entries.items()}).to_numpy()
+
+    def table(self):
+        """{company: {'code', 'avg_likes', 'count'}}, what company_stats.CompanyIndex.from_table() takes"""
+        return {company: {'code': entry['code'], 'count': entry['count'],
+                          'avg_likes': entry['like_sum'] / entry['count'] if entry['count'] else None}
+                for company, entry in self.entries.items()}
+
+    def avg_likes(self, companies):
+        averages = {company: entry['like_sum'] / entry['count'] if entry['count'] else np.nan
+                    for company, entry in self.entries.items()}
+        return companies.map(averages).to_numpy(dtype=np.float64)
+
+
+def load_state(path=None):
+    with open(path or state_path()) as f:
+        state = json.load(f)
+    state['companies'] = CompanyTable(state['companies'])
+    return state
+
+
+def save_state(state, path=None):
+    path = path or state_path()
+    with open(path + '.tmp', 'w') as f:
+        json.dump({**state, 'companies': state['companies'].entries}, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def source_or_default(source=None):
+    return source or os.environ.get('TIE_DATA_SOURCE') or SHEET_URL
+
+
+def init(source=None, model_path='like_predictor.pkl', chunksize=100_000):
+    """Writes the state for a model that was just fully retrained on `source`.
+
+    Reads the whole source once and makes it the data cache's snapshot of it (the one
+    the training run cached, if nothing changed since).
+    """
+    source = source_or_default(source)
+    raw, size = read_raw_from(source)
+    digest = store(source, raw)
+    stats = CorpusStats()
+    rows = 0
+    for chunk in read_chunks(cache_path(digest), TRAINING_COLUMNS, chunksize):
+        stats.update(chunk)
+        rows += len(chunk)
+    state = {
+        'rows_seen': rows,
+        'byte_offset': size,
+        'tail_digest': tail_digest(raw[-TAIL_BYTES:]),
+        'header': raw.split(b'\n', 1)[0].decode('utf-8') + '\n',
+        'model_sha256': file_digest(model_path),
+        'companies': CompanyTable.from_stats(stats),
+        'updates': [],
+    }
+    save_state(state)
+    return state
+
+
+def read_new_rows(source, state):
+    """(raw rows after byte_offset, the source's size, hash of the bytes before that size)"""
+    if 'byte_offset' not in state:
+        raise SystemExit(f'{state_path()} is from an older version; run `python incremental.py init`')
+    offset = state['byte_offset']
+    # starts a little early to check the bytes before the offset, nothing before them is read
+    window = min(TAIL_BYTES, offset)
+    raw, size = read_raw_from(source, offset - window)
+    if size < offset or tail_digest(raw[:window]) != state['tail_digest']:
+        raise SystemExit(f'the first {offset:,} bytes of the source changed since the last run; '
+                         'do a full retrain and `python incremental.py init`')
+    header = state['header'].encode('utf-8')
+    new = parse_csv(header + raw[window:]) if raw[window:].strip() else pd.DataFrame(columns=TRAINING_COLUMNS)
+
+    # the data cache keeps following the source, whether or not this update is promoted
+    cached = cached_size(source)
+    if cached is not None and offset <= cached < size:
+        rows = new if cached == offset else parse_csv(header + raw[window + cached - offset:])
+        append_rows(source, rows, size)
+    return new[TRAINING_COLUMNS], size, tail_digest(raw[-min(TAIL_BYTES, size):])
+
+
+def continue_booster(xgb, X, y, rounds):
+    """A copy of the fitted XGBRegressor `xgb` boosted `rounds` more rounds on (X, y)"""
+    params = xgb.get_params()
+    params['n_estimators'] = rounds
+    return type(xgb)(**params).fit(X, y, xgb_model=xgb.get_booster(), verbose=False)
+
+
+def _stack(model, predictions, X):
+    if model.passthrough:
+        return np.hstack([predictions, np.asarray(X)])
+    return predictions
+
+
+def rmse(model, X, y):
+    return float(np.sqrt(np.mean((model.predict(X) - np.asarray(y)) ** 2)))
+
+
+def blend_final_estimator(previous, fitted, history_rows, new_rows):
+    """`fitted` (a linear meta-layer fit on the new rows) averaged with `previous` by row count.
+
+    A meta-layer without coefficients (TIE_FINAL_ESTIMATOR=xgb/rf) can't be blended, and
+    a refit on the new rows alone would forget the history, so the previous one is kept.
+    """
+    if not hasattr(previous, 'coef_') or not hasattr(fitted, 'coef_'):
+        return copy.deepcopy(previous)
+    share = new_rows / (history_rows + new_rows)
+    fitted.coef_ = (1 - share) * previous.coef_ + share * fitted.coef_
+    fitted.intercept_ = (1 - share) * previous.intercept_ + share * fitted.intercept_
+    return fitted
+
+
+def update_model(model, X, y, rounds=20, cv=3, history_rows=0):
+    """A copy of the stacking model with its XGBoost learner continued and its meta-layer updated.
+
+    history_rows is how many rows the model was trained on before, the meta-layer's weight
+    for its previous coefficients.
+    """
+    names = [name for name, _ in model.estimators]
+    boosted = [i for i, estimator in enumerate(model.estimators_) if hasattr(estimator, 'get_booster')]
+    if len(boosted) != 1:
+        raise SystemExit('expected exactly one XGBoost base learner in the model')
+    xgb_index = boosted[0]
+    xgb = model.estimators_[xgb_index]
+
+    # the other base learners never saw these rows, so their predictions already are
+    # out-of-fold; the continued booster's come from cv folds, each continued separately
+    predictions = np.column_stack([estimator.predict(X) for estimator in model.estimators_])
+    for train, valid in KFold(cv).split(X):
+        predictions[valid, xgb_index] = continue_booster(xgb, X.iloc[train], y.iloc[train], rounds).predict(X.iloc[valid])
+
+    updated = copy.deepcopy(model)
+    updated.estimators_[xgb_index] = continue_booster(xgb, X, y, rounds)
+    updated.named_estimators_[names[xgb_index]] = updated.estimators_[xgb_index]
+    fitted = clone(model.final_estimator_).fit(_stack(model, predictions, X), y)
+    updated.final_estimator_ = blend_final_estimator(model.final_estimator_, fitted, history_rows, len(y))
+    return updated
+
+
+def update(source=None, model_path='like_predictor.pkl', tfidf_path='tfidf_vocab.npz', rounds=20,
+           holdout=0.2, min_rows=1000, min_holdout=300, log=print):
+    """Updates model_path from the new rows of `source` if that helps; returns the update record"""
+    state = load_state()
+    if file_digest(model_path) != state['model_sha256']:
+        raise SystemExit(f'{model_path} is not the model {state_path()} describes '
+                         '(retrained since?); run `python incremental.py init` first')
+
+    start = time.perf_counter()
+    source = source_or_default(source)
+    raw, size, new_tail = read_new_rows(source, state)
+    companies = state['companies']
+    companies.add_companies(raw['inferred company'])
+    prepared = prepare_chunk(raw)
+    record = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'new_rows': len(prepared), 'promoted': False}
+    # at least as many rows to train on as are held out
+    needed = max(min_rows, 2 * min_holdout)
+    if len(prepared) < needed:
+        log(f'{len(prepared)} new rows, waiting for at least {needed}')
+        return record
+    companies.add_likes(prepared)
+
+    vocabulary = TfidfVocabulary.load(tfidf_path)
+    X = FeatureExtractor().transform(
+        prepared['content'],
+        has_media=prepared['has_media'].to_numpy(),
+        hour=prepared['hour'].to_numpy(dtype=np.float64),
+        company_encoded=companies.codes(prepared['company']),
+        company_avg_likes=companies.avg_likes(prepared['company']),
+        tfidf_mean=vocabulary.tfidf_means(prepared['content']),
+    )
+    y = prepared['likes'].reset_index(drop=True)
+
+    # newest rows are the holdout: the question is whether the update predicts what comes next
+    n_train = len(X) - max(min_holdout, int(len(X) * holdout))
+    model = joblib.load(model_path)
+    updated = update_model(model, X.iloc[:n_train], y.iloc[:n_train], rounds, history_rows=state['rows_seen'])
+    record.update(
+        old_rmse=rmse(model, X.iloc[n_train:], y.iloc[n_train:]),
+        new_rmse=rmse(updated, X.iloc[n_train:], y.iloc[n_train:]),
+        seconds=time.perf_counter() - start,
+    )
+    log(f"{len(prepared):,} new rows: holdout rmse {record['old_rmse']:.2f} -> {record['new_rmse']:.2f} "
+        f"in {record['seconds']:.1f}s")
+
+    if record['new_rmse'] <= record['old_rmse']:
+        joblib.dump(updated, model_path + '.tmp', compress=3)
+        os.replace(model_path + '.tmp', model_path)
+        # keep the memory-mappable artifact in step when there is one
+        compiled_path = os.path.join(os.path.dirname(model_path), 'like_predictor_compiled.joblib')
+        compiled_written = os.path.exists(compiled_path)
+        if compiled_written:
+            compiled = CompiledStackingModel(updated, model_sha256=file_digest(model_path))
+            compiled.verify(updated, X)
+            compiled.save(compiled_path + '.tmp')
+            os.replace(compiled_path + '.tmp', compiled_path)
+        # serving needs the new companies and averages along with the model
+        company_path = os.path.join(os.path.dirname(model_path), 'company_table.npz')
+        CompanyIndex.from_table(companies.table()).save(company_path + '.tmp.npz')
+        os.replace(company_path + '.tmp.npz', company_path)
+        record['promoted'] = True
+        state.update(rows_seen=state['rows_seen'] + len(raw), byte_offset=size, tail_digest=new_tail,
+                     model_sha256=file_digest(model_path))
+        log(f"promoted; {state['rows_seen']:,} rows used so far")
+        if os.environ.get('TIE_BUNDLE_DIR'):
+            # running apps pick the new version up on their own (model_bundle.py)
+            files = {'model': model_path, 'tfidf': tfidf_path, 'companies': company_path}
+            if compiled_written:
+                files['compiled'] = compiled_path
+            version = publish(os.environ['TIE_BUNDLE_DIR'], files, source='incremental',
+                              holdout_rmse=record['new_rmse'])
+            log(f'published bundle {version}')
+    else:
+        # neither the model nor the row count moves, so these rows are tried again next time
+        log('kept the current model')
+        state = load_state()
+    state['updates'].append(record)
+    save_state(state)
+    return record
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Incrementally update the like predictor with new tweets.')
+    parser.add_argument('command', choices=['init', 'update'])
+    parser.add_argument('source', nargs='?', help='CSV path or URL (default: TIE_DATA_SOURCE, then the sheet)')
+    parser.add_argument('--model', default=os.environ.get('TIE_MODEL_PATH', 'like_predictor.pkl'))
+    parser.add_argument('--tfidf', default=os.environ.get('TIE_TFIDF_PATH', 'tfidf_vocab.npz'))
+    parser.add_argument('--rounds', type=int, default=20, help='boosting rounds added per update')
+    parser.add_argument('--holdout', type=float, default=0.2, help='share of the new rows held out')
+    parser.add_argument('--min-rows', type=int, default=1000, help='new rows needed before an update is tried')
+    parser.add_argument('--min-holdout', type=int, default=300, help='held-out rows, whatever --holdout says')
+    args = parser.parse_args()
+
+    if args.command == 'init':
+        state = init(args.source, args.model)
+        print(f"{state['rows_seen']:,} rows, {len(state['companies'].entries)} companies -> {state_path()}")
+    else:
+        update(args.source, args.model, args.tfidf, args.rounds, args.holdout, args.min_rows, args.min_holdout)
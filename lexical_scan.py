@@ -0,0 +1,224 @@
+"""word_count, char_count, emoji_count, has_hashtag and has_url from one scan of a tweet.
+
+features.py used to compute these separately: a split, a len and three regexes over
+every tweet. scan() does them together, and each regex only runs when a cheap test at
+C speed says it could match. Most generated tweets are plain ASCII without '#', '/' or
+'www', so for those it is just split, len and a few `in` checks:
+
+- emojis are only searched for in text that isn't pure ASCII
+- the hashtag regex only runs when there is a '#'
+- the URL regex only runs when there is a '/' or 'www' (every alternative of
+  URL_PATTERN needs one of them)
+
+A per-character Python loop was slower than these C-level passes, which is why the
+scanner doesn't walk the text itself. The results are exactly what the old functions
+return: `python lexical_scan.py` asserts that offline on TRICKY_TEXTS and every
+generated template (check_parity), and `python lexical_scan.py tweets.csv` also
+reports it on a corpus.
+
+Emojis are counted as runs of codepoints from a precomputed table. TIE_EMOJI_TABLE
+picks the table:
+
+- legacy (default): the four blocks EMOJI_PATTERN always matched, so existing models
+  get the same features they were trained on
+- full: every emoji block plus the older symbols that have an emoji presentation
+  (☀, ❤, ✅, ⭐ ...). Keycap sequences (1️⃣, #️⃣, *⃣) count as emojis too. Zero width
+  joiners, variation selectors and tag characters continue a run but don't start
+  one, so 👨‍👩‍👧 or 🏴󠁧󠁢󠁳󠁣󠁴󠁿 count once. This changes emoji_count, so the model has to be
+  retrained with it
+"""
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+# what EMOJI_PATTERN has always matched
+LEGACY_EMOJI_RANGES = [
+    (0x1F600, 0x1F64F),  # emoticons
+    (0x1F300, 0x1F5FF),  # symbols & pictographs
+    (0x1F680, 0x1F6FF),  # transport & map symbols
+    (0x1F1E0, 0x1F1FF),  # flags (iOS)
+]
+
+# the emoji blocks in full, plus the BMP symbols that can be shown as emoji
+FULL_EMOJI_RANGES = [
+    (0x1F000, 0x1FAFF),  # mahjong .. symbols & pictographs extended-a (includes the legacy blocks)
+    (0x1FC00, 0x1FFFD),  # reserved for future pictographs
+    (0x2600, 0x27BF),    # misc symbols, dingbats
+    (0x2B05, 0x2B07), (0x2B1B, 0x2B1C), (0x2B50, 0x2B50), (0x2B55, 0x2B55),
+    (0x2934, 0x2935),
+    (0x231A, 0x231B), (0x2328, 0x2328), (0x2388, 0x2388), (0x23CF, 0x23CF),
+    (0x23E9, 0x23F3), (0x23F8, 0x23FA),
+    (0x24C2, 0x24C2), (0x25AA, 0x25AB), (0x25B6, 0x25B6), (0x25C0, 0x25C0), (0x25FB, 0x25FE),
+    (0x2194, 0x2199), (0x21A9, 0x21AA),
+    (0x203C, 0x203C), (0x2049, 0x2049), (0x2122, 0x2122), (0x2139, 0x2139),
+    (0x3030, 0x3030), (0x303D, 0x303D), (0x3297, 0x3297), (0x3299, 0x3299),
+    (0x00A9, 0x00A9), (0x00AE, 0x00AE),
+]
+
+# a digit, '#' or '*' followed by the combining keycap, e.g. 1️⃣
+KEYCAP_SEQUENCE = '[0-9#*]\ufe0f?\u20e3'
+
+# only continue a run: zero width joiner, variation selectors, keycap, tags
+JOINER_RANGES = [(0x200D, 0x200D), (0xFE0E, 0xFE0F), (0x20E3, 0x20E3), (0xE0020, 0xE007F)]
+
+EMOJI_TABLES = {'legacy': LEGACY_EMOJI_RANGES, 'full': FULL_EMOJI_RANGES}
+
+EMOJI_TABLE = os.environ.get('TIE_EMOJI_TABLE', 'legacy')
+if EMOJI_TABLE not in EMOJI_TABLES:
+    raise ValueError(f"Unknown TIE_EMOJI_TABLE {EMOJI_TABLE!r}, expected one of {list(EMOJI_TABLES)}")
+
+
+def _char_class(ranges):
+    return ''.join(chr(start) if start == end else f'{chr(start)}-{chr(end)}' for start, end in ranges)
+
+
+def emoji_run_pattern(table):
+    """Regex matching one run of emojis from EMOJI_TABLES[table]"""
+    symbols = _char_class(EMOJI_TABLES[table])
+    if table == 'legacy':
+        # the pattern features.py always used
+        return re.compile(f'[{symbols}]+', flags=re.UNICODE)
+    # the keycap's base is ASCII, so it is matched as a sequence rather than by the table
+    joiners = _char_class(JOINER_RANGES)
+    return re.compile(f'(?:{KEYCAP_SEQUENCE}|[{symbols}])(?:{KEYCAP_SEQUENCE}|[{symbols}{joiners}])*',
+                      flags=re.UNICODE)
+
+
+# compiled once at import instead of on every call
+EMOJI_PATTERN = emoji_run_pattern('legacy')
+
+HASHTAG_PATTERN = re.compile(r'#\w+')
+
+# same URL regex as before, just with non-capturing groups so pandas .str.contains
+# doesn't warn about match groups
+URL_PATTERN = re.compile(
+    r'(?i)\b(?:(?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)'
+    r'(?:[^\s()<>]+|\((?:[^\s()<>]+|(?:\([^\s()<>]+\)))*\))+'
+    r'(?:\((?:[^\s()<>]+|(?:\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:\'".,<>?«»“”‘’]))'
+)
+
+_emoji_runs = emoji_run_pattern(EMOJI_TABLE).findall
+_hashtag = HASHTAG_PATTERN.search
+_url = URL_PATTERN.search
+
+# scan_many()'s columns, in scan()'s order
+SCAN_COLUMNS = ['word_count', 'char_count', 'emoji_count', 'has_hashtag', 'has_url']
+
+
+def scan(text):
+    """(word_count, char_count, emoji_count, has_hashtag, has_url) for one str"""
+    return (
+        len(text.split()),
+        len(text),
+        0 if text.isascii() else len(_emoji_runs(text)),
+        1 if '#' in text and _hashtag(text) else 0,
+        # (?i) matches 'www' in any case, nothing else can turn into it
+        1 if ('/' in text or 'www' in text.lower()) and _url(text) else 0,
+    )
+
+
+def scan_many(texts):
+    """scan() for a list of strings, as an int64 array with SCAN_COLUMNS as columns"""
+    rows = [scan(text if type(text) is str else str(text)) for text in texts]
+    return np.array(rows, dtype=np.int64).reshape(len(rows), len(SCAN_COLUMNS))
+
+
+# tweets the generated data doesn't have, to exercise the guards
+TRICKY_TEXTS = [
+    '', '   ', 'no features here', '#', '# tag', '#tag', 'mid#tag', '#_', '#ça', 'C# and F#',
+    'www', 'WWW.example.com', 'wwwx.com', 'www1.example.com', 'visit www.example.com.',
+    'http://x.co', 'HTTPS://X.CO/a', 'ftp://x.co', 'example.com/path', 'example.com',
+    'a/b', 'n/a', '10/10 would buy', '(https://x.co/(a))', 'https://x.co)', 'KELVIN.Kk/',
+    '🚀', '🚀🔥', '🚀 🔥', 'a🚀b🔥c', '🇺🇸', '👍🏽', '👨‍👩‍👧', '☀ ❤️ ✅ ⭐', '1️⃣',
+    'café ☕ #morning https://x.co', 'tab\tand\nnewline', ' nbsp em space　',
+]
+
+
+# emoji runs the full table should find, whatever TIE_EMOJI_TABLE is set to
+FULL_TABLE_EMOJI_COUNTS = {
+    '🚀🔥': 1, '🚀 🔥': 2, '👨‍👩‍👧': 1, '🏴󠁧󠁢󠁳󠁣󠁴󠁿': 1, '👍🏽': 1, '☀ ❤️ ✅ ⭐': 4,
+    '1️⃣': 1, '1⃣': 1, '#️⃣ and *️⃣': 2, 'step 1️⃣2️⃣': 1, '🚀1️⃣': 1, '10/10': 0, '#1': 0,
+}
+
+
+def generated_candidates():
+    """generate_candidates() for every template with a few companies and messages, tricky ones included"""
+    from tweet_generator import SimpleTweetGenerator
+
+    generator = SimpleTweetGenerator()
+    candidates = []
+    for company in ['Nike', 'Café Noir', 'AT&T', 'x']:
+        for message in [None, 'big news', 'new drop 🚀🔥 #launch', 'see www.example.com/a or https://x.co',
+                        'C# tips 1️⃣ 2️⃣ 3️⃣', '  spaced   out  ']:
+            candidates += generator.generate_candidates(company, message=message, topic=message)
+    return candidates
+
+
+def check_parity():
+    """Asserts scan() matches the separate functions in features.py, offline.
+
+    Runs on TRICKY_TEXTS and generated_candidates(), lower-cased too, and checks each
+    candidate's 'lexical' (from its template skeleton) is scan(tweet). emoji_count is only
+    compared with count_emojis for the legacy table; the full table is checked
+    against FULL_TABLE_EMOJI_COUNTS instead.
+    """
+    from features import count_emojis, has_hashtag, has_url
+
+    candidates = generated_candidates()
+    for candidate in candidates:
+        assert candidate['lexical'] == scan(candidate['tweet']), candidate['tweet']
+
+    texts = TRICKY_TEXTS + [candidate['tweet'] for candidate in candidates]
+    texts += [text.lower() for text in texts]
+    for text in texts:
+        words, chars, emojis, hashtag, url = scan(text)
+        assert (words, chars) == (len(text.split()), len(text)), text
+        assert hashtag == has_hashtag(text), text
+        assert url == has_url(text), text
+        if EMOJI_TABLE == 'legacy':
+            assert emojis == count_emojis(text), text
+
+    full_runs = emoji_run_pattern('full').findall
+    for text, count in FULL_TABLE_EMOJI_COUNTS.items():
+        assert len(full_runs(text)) == count, (text, full_runs(text))
+    return len(texts)
+
+
+def parity_report(texts):
+    """Compares scan_many() with the separate functions in features.py on `texts`"""
+    from features import count_emojis, has_hashtag, has_url
+
+    texts = [str(text) for text in texts] + TRICKY_TEXTS
+    start = time.perf_counter()
+    expected = np.array([(len(text.split()), len(text), count_emojis(text), has_hashtag(text), has_url(text))
+                         for text in texts], dtype=np.int64).reshape(len(texts), len(SCAN_COLUMNS))
+    separate_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = scan_many(texts)
+    scan_seconds = time.perf_counter() - start
+
+    report = {'texts': len(texts), 'emoji_table': EMOJI_TABLE}
+    for i, column in enumerate(SCAN_COLUMNS):
+        report[f'{column}_mismatches'] = int(np.sum(actual[:, i] != expected[:, i]))
+    report['separate_us_per_text'] = round(separate_seconds / len(texts) * 1e6, 2)
+    report['scan_us_per_text'] = round(scan_seconds / len(texts) * 1e6, 2)
+    return report
+
+
+# usage: python lexical_scan.py [tweets.csv]
+# the offline check always runs; a csv (or "training" for the training data) adds a report.
+# with TIE_EMOJI_TABLE=full the report's emoji_count mismatches are the newly counted emojis
+if __name__ == "__main__":
+    print(f"check_parity: ok ({check_parity()} texts, {EMOJI_TABLE} table)")
+
+    if len(sys.argv) > 1:
+        from data_ingest import load_dataset
+
+        source = None if sys.argv[1] == 'training' else sys.argv[1]
+        corpus = load_dataset(source, columns=['content'])['content'].dropna().astype(str)
+        # both as stored and lower-cased like training sees it
+        for key, value in parity_report(list(corpus) + list(corpus.str.strip().str.lower())).items():
+            print(f"{key}: {value}")
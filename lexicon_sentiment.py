@@ -0,0 +1,303 @@
+import sys
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from textblob._text import (
+    ABBREVIATIONS,
+    EMOTICONS,
+    PUNCTUATION,
+    RE_ABBR1,
+    RE_ABBR2,
+    RE_ABBR3,
+    RE_EMOTICONS,
+    RE_SARCASM,
+    replacements as CONTRACTIONS,
+)
+from textblob.en import sentiment as pattern_sentiment
+
+LEADING_PUNCTUATION = PUNCTUATION.replace('.', '')
+TRAILING_PUNCTUATION = PUNCTUATION + '.'
+# pattern puts spaces around quotes, which turns them into one-character tokens
+QUOTES = str.maketrans({quote: f' {quote} ' for quote in '“”‘’\'"'})
+
+# what pattern checks every unknown token against (first matching mood wins)
+EMOTICON_POLARITY = {}
+for (_, _polarity), _faces in EMOTICONS.items():
+    for _face in _faces:
+        if not _face.isalpha() and len(_face) <= 5 and _face not in PUNCTUATION:
+            EMOTICON_POLARITY.setdefault(_face.lower(), _polarity)
+SARCASM = '(!)'
+
+
+def _clamp(value):
+    return max(-1.0, min(value, 1.0))
+
+
+class LexiconSentiment:
+    """TextBlob's (pattern's) polarity computed from a precomputed lexicon table.
+
+    The pattern lexicon is loaded once into arrays (polarity, intensity, is-modifier) indexed
+    by word id. polarities() tokenizes a whole batch, looks every token up in one pass and
+    scores tweets made of plain lexicon words, modifier chains ("really good") and
+    exclamation marks with NumPy segment sums. Tweets with a negation, emoticon or sarcasm
+    mark are rarer and follow pattern's sequential rules in a small loop.
+
+    Scores match TextBlob(text).sentiment.polarity on lower-cased, whitespace-collapsed
+    text (what the polarity cache feeds it); run this module on a CSV to check agreement.
+    """
+
+    def __init__(self):
+        if not dict.__len__(pattern_sentiment):
+            pattern_sentiment.load()
+        words = sorted(dict.keys(pattern_sentiment))
+        self.vocabulary = {word: index for index, word in enumerate(words)}
+        scores = [dict.__getitem__(pattern_sentiment, word) for word in words]
+        self.word_polarity = np.array([score[None][0] for score in scores], dtype=np.float64)
+        self.word_intensity = np.array([score[None][2] for score in scores], dtype=np.float64)
+        self.is_modifier = np.array([any(tag in score for tag in pattern_sentiment.modifiers)
+                                  for score in scores], dtype=bool)
+        self.negations = frozenset(pattern_sentiment.negations)
+        self._vocabulary_series = pd.Series(self.vocabulary, dtype=np.int64)
+        self._polarity_list = self.word_polarity.tolist()
+        self._intensity_list = self.word_intensity.tolist()
+        self._modifier_list = self.is_modifier.tolist()
+
+    def tokenize(self, text):
+        """Lower-cased tokens as pattern's find_tokens would produce them, minus score-neutral punctuation"""
+        text = str(text).lower()
+        for contraction, spaced in CONTRACTIONS.items():
+            text = text.replace(contraction, spaced)
+        pieces = []
+        split = False
+        for chunk in text.translate(QUOTES).split():
+            if chunk[0] not in LEADING_PUNCTUATION and chunk[-1] not in TRAILING_PUNCTUATION:
+                pieces.append(chunk)
+            else:
+                pieces.extend(self._split_chunk(chunk))
+                split = True
+        if split:
+            # same regexes pattern uses to glue "( ! )" and ": - )" back together
+            joined = RE_SARCASM.sub(SARCASM, ' '.join(pieces))
+            joined = RE_EMOTICONS.sub(lambda m: m.group(1).replace(' ', '') + m.group(2), joined)
+            pieces = joined.split()
+        # lone punctuation other than "!" never changes the score
+        return [piece for piece in pieces if len(piece) > 1 or piece == '!' or piece not in PUNCTUATION]
+
+    def _split_chunk(self, chunk):
+        # leading/trailing punctuation split exactly like find_tokens
+        pieces = []
+        while chunk and chunk[0] in LEADING_PUNCTUATION:
+            pieces.append(chunk[0])
+            chunk = chunk[1:]
+        tail = []
+        while chunk and chunk[-1] in TRAILING_PUNCTUATION:
+            if chunk[-1] in LEADING_PUNCTUATION:
+                tail.append(chunk[-1])
+                chunk = chunk[:-1]
+            if chunk.endswith('...'):
+                tail.append('...')
+                chunk = chunk[:-3].rstrip('.')
+            if chunk.endswith('.'):
+                if (chunk in ABBREVIATIONS or RE_ABBR1.match(chunk) or RE_ABBR2.match(chunk)
+                        or RE_ABBR3.match(chunk)):
+                    break
+                tail.append('.')
+                chunk = chunk[:-1]
+        if chunk:
+            pieces.append(chunk)
+        pieces.extend(reversed(tail))
+        return pieces
+
+    def polarity_of_tokens(self, tokens):
+        """pattern's Sentiment.assessments() + averaging, for one tokenized text"""
+        assessments = []  # [polarity, intensity, negated]
+        modifier = None
+        negation = None
+        for token in tokens:
+            index = self.vocabulary.get(token)
+            if index is not None:
+                polarity = self._polarity_list[index]
+                intensity = self._intensity_list[index]
+                if modifier is None:
+                    assessments.append([polarity, intensity, False])
+                else:
+                    # "really good": fold into the modifier's assessment
+                    last = assessments[-1]
+                    last[0] = _clamp(polarity * last[1])
+                    last[1] = intensity
+                if negation is not None:
+                    assessments[-1][1] = 1.0 / assessments[-1][1]
+                    assessments[-1][2] = True
+                modifier = token if self._modifier_list[index] else None
+                negation = token if token in self.negations else None
+                continue
+
+            if token in self.negations:
+                negation = token
+            elif negation and len(token.strip("'")) > 1:
+                # negation survives small words only ("not a good")
+                negation = None
+            if negation is not None and modifier is not None and modifier.endswith('ly'):
+                # "really not good"
+                assessments[-1][2] = True
+                negation = None
+            elif modifier and len(token) > 2:
+                modifier = None
+            if token == '!' and assessments:
+                assessments[-1][0] = _clamp(assessments[-1][0] * 1.25)
+            if token == SARCASM:
+                assessments.append([0.0, 1.0, False])
+            mood = EMOTICON_POLARITY.get(token)
+            if mood is not None:
+                assessments.append([mood, 1.0, False])
+
+        if not assessments:
+            return 0.0
+        # "not good" = slightly bad, "not bad" = slightly good
+        return sum(p * -0.5 if negated else p for p, _, negated in assessments) / len(assessments)
+
+    def polarity(self, text):
+        return self.polarity_of_tokens(self.tokenize(text))
+
+    def polarities(self, texts):
+        """Polarity for every text, as a float64 array in input order"""
+        token_lists = [self.tokenize(text) for text in texts]
+        result = np.zeros(len(token_lists), dtype=np.float64)
+        if not token_lists:
+            return result
+
+        lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=len(token_lists))
+        flat = pd.Series([token for tokens in token_lists for token in tokens], dtype=object)
+        doc = np.repeat(np.arange(len(token_lists)), lengths)
+        word = flat.map(self._vocabulary_series).fillna(-1).to_numpy(dtype=np.int64)
+        known = word >= 0
+
+        # anything that needs pattern's sequential negation / emoticon / sarcasm rules
+        special = (~known & (flat.isin(list(self.negations)) | flat.isin(list(EMOTICON_POLARITY))
+                             | (flat == SARCASM))).to_numpy()
+        sequential = np.zeros(len(token_lists), dtype=bool)
+        sequential[doc[special]] = True
+        for i in np.flatnonzero(sequential):
+            result[i] = self.polarity_of_tokens(token_lists[i])
+
+        keep = ~sequential[doc]
+        word, known, doc = word[keep], known[keep], doc[keep]
+        token_length = flat.str.len().to_numpy()[keep]
+        bang = (flat == '!').to_numpy()[keep]
+        if not known.any():
+            return result
+
+        long_unknown = np.cumsum(~known & (token_length > 2))
+        bangs = np.cumsum(bang)
+        positions = np.flatnonzero(known)
+        known_word = word[positions]
+        known_doc = doc[positions]
+
+        # a known word folds into the previous assessment when the previous known word in the
+        # same tweet is a modifier and no unknown word longer than two characters sits between
+        follows_modifier = np.zeros(len(positions), dtype=bool)
+        follows_modifier[1:] = (
+            (known_doc[1:] == known_doc[:-1])
+            & self.is_modifier[known_word[:-1]]
+            & (long_unknown[positions[1:]] == long_unknown[positions[:-1]])
+        )
+        group = np.cumsum(~follows_modifier) - 1
+        last = np.flatnonzero(np.append(group[1:] != group[:-1], True))
+        polarity = self.word_polarity[known_word[last]]
+        chained = follows_modifier[last]
+        polarity[chained] = np.clip(polarity[chained] * self.word_intensity[known_word[last[chained] - 1]], -1.0, 1.0)
+
+        # "!" boosts whatever assessment is last when it appears, i.e. each group gets
+        # the exclamation marks between its last word and the next known word or tweet end
+        next_stop = np.empty(len(last), dtype=np.int64)
+        doc_end = np.cumsum(np.bincount(doc, minlength=len(token_lists)))
+        has_next = (last + 1 < len(positions))
+        has_next[has_next] = known_doc[last[has_next] + 1] == known_doc[last[has_next]]
+        next_stop[has_next] = positions[last[has_next] + 1]
+        next_stop[~has_next] = doc_end[known_doc[last[~has_next]]]
+        boosts = bangs[next_stop - 1] - bangs[positions[last]]
+        polarity = np.clip(polarity * 1.25 ** boosts, -1.0, 1.0)
+
+        group_doc = known_doc[last]
+        totals = np.bincount(group_doc, weights=polarity, minlength=len(token_lists))
+        counts = np.bincount(group_doc, minlength=len(token_lists))
+        scored = counts > 0
+        result[scored & ~sequential] = totals[scored & ~sequential] / counts[scored & ~sequential]
+        return result
+
+    def sentiments(self, texts):
+        """Positive/Neutral/Negative labels, bucketed exactly like features.get_sentiment"""
+        polarity = self.polarities(texts)
+        return np.where(polarity > 0, 'Positive', np.where(polarity < 0, 'Negative', 'Neutral'))
+
+
+@lru_cache(maxsize=None)
+def default_engine():
+    return LexiconSentiment()
+
+
+def lexicon_polarity(text):
+    return default_engine().polarity(text)
+
+
+def lexicon_polarities(texts):
+    return default_engine().polarities(texts)
+
+
+# negation, intensifiers, "!", emoticons, contractions, sarcasm and unknown words
+SENTIMENT_TEXTS = [
+    'great :D', 'Great :D', 'not good at all', 'very very bad!!!', 'i love it :)', 'never happy :(',
+    'this is not bad', "don't like it", "it's the best day ever", 'so awesome!!', 'pretty terrible, not great',
+    'extremely disappointing.', 'meh', 'wow 😍 amazing', 'oh great (!)', 'good. bad. good!', 'quite nice',
+    'the "best" product', "i can't even", 'a somewhat good, really bad, very terrible idea', 'zzzqx blorf',
+]
+
+
+def check_parity():
+    """Asserts the lexicon engine matches TextBlob, offline.
+
+    Runs on SENTIMENT_TEXTS, lexical_scan.TRICKY_TEXTS and every generated template
+    (lexical_scan.generated_candidates()), normalized like the polarity cache.
+    """
+    from textblob import TextBlob
+    from lexical_scan import TRICKY_TEXTS, generated_candidates
+    from sentiment_cache import normalize_text
+
+    texts = SENTIMENT_TEXTS + TRICKY_TEXTS + [candidate['tweet'] for candidate in generated_candidates()]
+    texts = [normalize_text(text) for text in texts]
+    actual = default_engine().polarities(texts)
+    for text, polarity in zip(texts, actual):
+        assert np.isclose(polarity, TextBlob(text).sentiment.polarity, atol=1e-9), text
+    return len(texts)
+
+
+def parity_report(texts):
+    """Compares the lexicon engine with TextBlob on `texts` (normalized like the polarity cache)"""
+    from textblob import TextBlob
+    from sentiment_cache import normalize_text
+
+    texts = [normalize_text(text) for text in texts]
+    expected = np.array([TextBlob(text).sentiment.polarity for text in texts])
+    actual = default_engine().polarities(texts)
+    bucket = lambda p: np.sign(np.round(p, 12))
+    return {
+        'texts': len(texts),
+        'polarity_agreement': float(np.mean(np.isclose(actual, expected, atol=1e-9))),
+        'sentiment_agreement': float(np.mean(bucket(actual) == bucket(expected))),
+        'max_abs_error': float(np.max(np.abs(actual - expected))) if texts else 0.0,
+    }
+
+
+# usage: python lexicon_sentiment.py [tweets.csv]
+# the offline check always runs; a csv (or "training" for the training data) adds a report
+if __name__ == "__main__":
+    print(f"check_parity: ok ({check_parity()} texts)")
+
+    if len(sys.argv) > 1:
+        from data_ingest import load_dataset
+
+        source = None if sys.argv[1] == 'training' else sys.argv[1]
+        corpus = load_dataset(source, columns=['content'])['content'].dropna().astype(str)
+        for key, value in parity_report(corpus).items():
+            print(f"{key}: {value}")
@@ -0,0 +1,310 @@
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# seconds; the serving stages range from ~10us (regex features) to ~10ms (sklearn predict)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# counters and histograms of workers that have exited, summed into one file
+AGGREGATE_FILE = 'dead_workers.json'
+
+
+@contextmanager
+def _directory_lock(directory):
+    # folding a snapshot into the aggregate must not overlap with another fold or a read
+    with open(os.path.join(directory, '.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(data, f)
+    # readers never see a half-written file
+    os.replace(f'{path}.tmp', path)
+
+
+def _fold(directory, pid):
+    # caller holds the directory lock
+    path = os.path.join(directory, f'{pid}.json')
+    try:
+        snapshot = _read_json(path)
+    except OSError:
+        return
+    except ValueError:
+        os.remove(path)
+        return
+    aggregate_path = os.path.join(directory, AGGREGATE_FILE)
+    try:
+        aggregate = _read_json(aggregate_path)
+    except (OSError, ValueError):
+        aggregate = {'pid': None, 'buckets': snapshot['buckets'], 'counters': [], 'gauges': [], 'histograms': []}
+
+    counters = {(name, tuple(map(tuple, labels))): value for name, labels, value in aggregate['counters']}
+    for name, labels, value in snapshot['counters']:
+        key = (name, tuple(map(tuple, labels)))
+        counters[key] = counters.get(key, 0) + value
+    histograms = {(name, tuple(map(tuple, labels))): values for name, labels, values in aggregate['histograms']}
+    if snapshot['buckets'] == aggregate['buckets']:
+        for name, labels, values in snapshot['histograms']:
+            total = histograms.setdefault((name, tuple(map(tuple, labels))), [0] * len(values))
+            for i, value in enumerate(values):
+                total[i] += value
+    aggregate['counters'] = [[name, list(labels), value] for (name, labels), value in counters.items()]
+    aggregate['histograms'] = [[name, list(labels), values] for (name, labels), values in histograms.items()]
+    _write_json(aggregate_path, aggregate)
+    os.remove(path)
+
+
+def mark_process_dead(pid, directory):
+    """Moves an exited worker's counters and histograms into the aggregate file.
+
+    Its own snapshot file is removed, so recycled workers (gunicorn max_requests) don't
+    pile up files and a new process that gets the same pid starts from a clean slate.
+    Gauges are dropped. gunicorn.conf.py calls this from child_exit.
+    """
+    with _directory_lock(directory):
+        _fold(directory, pid)
+
+
+def clear_directory(directory):
+    """Removes every snapshot, for a fresh server start (gunicorn's on_starting)"""
+    if not os.path.isdir(directory):
+        return
+    with _directory_lock(directory):
+        for path in glob.glob(os.path.join(directory, '*.json')) + glob.glob(os.path.join(directory, '*.json.tmp')):
+            os.remove(path)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+class Metrics:
+    """Counters and latency histograms for the serving path, rendered in Prometheus text format.
+
+    Each process keeps its own numbers. With `directory` set, every worker also writes a
+    snapshot to `<directory>/<pid>.json` (at most once per `flush_interval` seconds) and
+    render() sums the snapshots of all workers, so whichever worker answers /metrics
+    reports the whole server (each worker's part is at most `flush_interval` old).
+    Counters from workers that have exited are folded into one aggregate file
+    (mark_process_dead) so totals never go down; their gauges are dropped.
+
+    Collectors are callables returning {name: value} that are read at snapshot time;
+    names ending in _total are exported as counters, the rest as gauges. A key can also
+    be a (name, ((label, value), ...)) pair.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0, buckets=LATENCY_BUCKETS):
+        self.directory = directory
+        self.flush_interval = float(flush_interval)
+        self.buckets = tuple(buckets)
+        self.collectors = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._local = threading.local()
+        self._reset()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self._last_flush = 0.0
+        self._dirty = False
+        self._flusher = None
+        # a <pid>.json that exists before our first write is a dead process's
+        self._owns_file = False
+
+    def _check_fork(self):
+        # caller holds the lock; a forked worker starts from zero, the parent's
+        # numbers belong to the parent
+        if self._pid != os.getpid():
+            self._reset()
+
+    def add_collector(self, collect):
+        self.collectors.append(collect)
+
+    @contextmanager
+    def suspended(self):
+        """Drops whatever this thread records inside the block (warm-up work, not traffic)"""
+        self._local.suspended = True
+        try:
+            yield
+        finally:
+            self._local.suspended = False
+
+    def inc(self, name, amount=1, **labels):
+        if getattr(self._local, 'suspended', False):
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            self._counters[key] = self._counters.get(key, 0) + amount
+        self._maybe_flush()
+
+    def observe(self, name, seconds, **labels):
+        if getattr(self._local, 'suspended', False):
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+                    break
+            else:
+                histogram[len(self.buckets)] += 1
+            histogram[-1] += seconds
+        self._maybe_flush()
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """This process's numbers (plus collector readings) as a JSON-friendly dict"""
+        gauges = []
+        counters = []
+        for collect in self.collectors:
+            for key, value in collect().items():
+                name, labels = key if isinstance(key, tuple) else (key, ())
+                (counters if name.endswith('_total') else gauges).append([name, sorted(labels), value])
+        with self._lock:
+            self._check_fork()
+            counters += [[name, list(labels), value] for (name, labels), value in self._counters.items()]
+            histograms = [[name, list(labels), list(values)] for (name, labels), values in self._histograms.items()]
+        return {
+            'pid': os.getpid(),
+            'buckets': list(self.buckets),
+            'counters': counters,
+            'gauges': gauges,
+            'histograms': histograms,
+        }
+
+    def _maybe_flush(self):
+        if not self.directory:
+            return
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+            return
+        # too soon to write again; make sure an idle worker still writes it out later
+        with self._lock:
+            self._dirty = True
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.flush_interval)
+            if self._dirty:
+                self.flush()
+
+    def flush(self):
+        if not self.directory:
+            return
+        with self._flush_lock:
+            self._last_flush = time.monotonic()
+            self._dirty = False
+            if not self._owns_file:
+                # our pid was used before: keep that process's counters instead of overwriting them
+                mark_process_dead(os.getpid(), self.directory)
+                self._owns_file = True
+            _write_json(os.path.join(self.directory, f'{os.getpid()}.json'), self.snapshot())
+
+    def _snapshots(self):
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        with _directory_lock(self.directory):
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                pid = os.path.basename(path)[:-len('.json')]
+                if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                    # exited without child_exit running (killed, or not under gunicorn)
+                    _fold(self.directory, int(pid))
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                try:
+                    snapshots.append(_read_json(path))
+                except (OSError, ValueError):
+                    continue
+        return snapshots
+
+    def render(self):
+        """All workers' metrics, summed, in Prometheus text exposition format"""
+        counters = {}
+        gauges = {}
+        histograms = {}
+        for snapshot in self._snapshots():
+            for kind, totals in (('counters', counters), ('gauges', gauges)):
+                for name, labels, value in snapshot[kind]:
+                    key = (name, tuple(map(tuple, labels)))
+                    totals[key] = totals.get(key, 0) + value
+            if snapshot['buckets'] != list(self.buckets):
+                continue
+            for name, labels, values in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                total = histograms.setdefault(key, [0] * len(values))
+                for i, value in enumerate(values):
+                    total[i] += value
+
+        lines = []
+        for kind, totals in (('counter', counters), ('gauge', gauges)):
+            seen = set()
+            for (name, labels), value in sorted(totals.items()):
+                if name not in seen:
+                    lines.append(f'# TYPE {name} {kind}')
+                    seen.add(name)
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+
+        seen = set()
+        for (name, labels), values in sorted(histograms.items()):
+            if name not in seen:
+                lines.append(f'# TYPE {name} histogram')
+                seen.add(name)
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", repr(bound)),))} {cumulative}')
+            cumulative += values[len(self.buckets)]
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {values[-1]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,144 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Collects single feature rows from many threads and predicts them together.
+
+    Callers put a row on a queue and wait on a Future; one background thread flushes
+    as soon as `max_batch_size` rows are waiting or `max_wait_ms` has passed since the
+    first row of the batch arrived, runs one vectorized predict_fn over the stacked
+    rows and hands each caller its own prediction back.
+
+    submit()/predict() take an optional `context` (the app passes the model bundle the
+    request is using). Rows are only predicted together with rows of the same context,
+    and a non-None context is passed on as predict_fn(X, context).
+
+    The worker thread is started lazily in whichever process first submits, so an
+    instance created before gunicorn forks still works in every worker.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=2.0):
+        if max_batch_size < 1:
+            raise ValueError('max_batch_size must be at least 1')
+        self.predict_fn = predict_fn
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000.0
+
+        # batch size histogram buckets: 1, 2, 4, ... up to max_batch_size
+        bounds = [1]
+        while bounds[-1] < self.max_batch_size:
+            bounds.append(min(bounds[-1] * 2, self.max_batch_size))
+        self.bucket_bounds = bounds
+
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._bucket_counts = [0] * len(self.bucket_bounds)
+        self._batches = 0
+        self._rows = 0
+        self._errors = 0
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # forked: the parent's queue and thread don't exist here
+                self._reset()
+                self._pid = os.getpid()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, row, context=None):
+        """Queues one feature row and returns a Future for its prediction"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((row, context, future))
+        return future
+
+    def predict(self, row, timeout=None, context=None):
+        """Blocking single-row predict that goes through the batch queue"""
+        return self.submit(row, context).result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            groups = {}
+            for row, context, future in self._collect():
+                if future.set_running_or_notify_cancel():
+                    groups.setdefault(id(context), (context, []))[1].append((row, future))
+            # normally one group; more only while the app is swapping model bundles
+            for context, batch in groups.values():
+                self._predict_batch(context, batch)
+
+    def _predict_batch(self, context, batch):
+        # everything that can fail is in the try: this is the only worker thread, if it
+        # died every later caller would wait forever
+        try:
+            X = np.array([row for row, _ in batch])
+            predictions = self.predict_fn(X) if context is None else self.predict_fn(X, context)
+            if len(predictions) != len(batch):
+                raise ValueError(f'predict_fn returned {len(predictions)} predictions for {len(batch)} rows')
+            for (_, future), prediction in zip(batch, predictions):
+                future.set_result(prediction)
+            failed = False
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            failed = True
+        self._record(len(batch), failed)
+
+    def _record(self, size, failed):
+        with self._stats_lock:
+            for i, bound in enumerate(self.bucket_bounds):
+                if size <= bound:
+                    self._bucket_counts[i] += 1
+                    break
+            self._batches += 1
+            self._rows += size
+            self._errors += int(failed)
+
+    def stats(self):
+        """Returns queue depth, batch/row counts and the batch size histogram.
+
+        The histogram is a list of {'le': bound, 'count': n} buckets; each count covers
+        sizes above the previous bound up to and including this one.
+        """
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batches': self._batches,
+                'rows': self._rows,
+                'errors': self._errors,
+                'batch_size_histogram': [
+                    {'le': bound, 'count': count} for bound, count in zip(self.bucket_bounds, self._bucket_counts)
+                ],
+            }
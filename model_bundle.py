@@ -0,0 +1,299 @@
+"""Versioned model bundles, and hot reloading them in a running app.
+
+A bundle directory holds one subdirectory per version plus a CURRENT file naming the
+active one:
+
+    bundles/
+      CURRENT                          "20261018-093000-1a2b3c4d"
+      20261018-093000-1a2b3c4d/
+        manifest.json                  version, feature columns, emoji table, sha256 + size of every file
+        like_predictor.pkl
+        tfidf_vocab.npz                (optional)
+        company_table.npz              (optional)
+        like_predictor_compiled.joblib (optional)
+
+publish() copies the artifacts training wrote into a new version directory, then points
+CURRENT at it with one atomic rename. Version directories are never modified afterwards,
+so a worker that is still loading the previous version is never affected.
+
+BundleWatcher is the serving side. It polls CURRENT from a background thread in each
+worker. When the version changes, it loads the new bundle (checking hashes and the
+feature schema), warms it, and then swaps it in with a single attribute assignment.
+Requests that already hold the old Bundle finish on it. A bundle that fails to load is
+logged and skipped, and the old one keeps serving.
+
+    python model_bundle.py publish [--dir bundles]   # after SJ_model_week3.py
+    python model_bundle.py list | activate VERSION | verify [VERSION]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+from features import FEATURE_COLUMNS
+from lexical_scan import EMOJI_TABLE
+
+MANIFEST = 'manifest.json'
+CURRENT = 'CURRENT'
+
+# artifact -> file name inside a version directory
+BUNDLE_FILES = {
+    'model': 'like_predictor.pkl',
+    'tfidf': 'tfidf_vocab.npz',
+    'companies': 'company_table.npz',
+    'compiled': 'like_predictor_compiled.joblib',
+}
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def current_version(directory):
+    try:
+        with open(os.path.join(directory, CURRENT)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def list_versions(directory):
+    return sorted(name for name in os.listdir(directory)
+                  if os.path.exists(os.path.join(directory, name, MANIFEST)))
+
+
+def activate(directory, version):
+    """Points CURRENT at an existing version (also how to roll back)"""
+    if not os.path.exists(os.path.join(directory, version, MANIFEST)):
+        raise ValueError(f'{directory} has no bundle {version!r}')
+    path = os.path.join(directory, CURRENT)
+    with open(path + '.tmp', 'w') as f:
+        f.write(version + '\n')
+    os.replace(path + '.tmp', path)
+
+
+def publish(directory, paths=None, version=None, make_current=True, **info):
+    """Copies the artifacts into a new version directory and returns the version.
+
+    `paths` maps BUNDLE_FILES keys to files; by default the file names training writes
+    to the working directory. Only the model is required. The compiled artifact is only
+    included when `paths` names it (a stale one left by an older run would otherwise be
+    published next to a new model), and it has to be compiled from this model.
+    """
+    paths = paths or {key: name for key, name in BUNDLE_FILES.items() if key != 'compiled'}
+    if not os.path.exists(paths.get('model') or ''):
+        raise ValueError(f"model file {paths.get('model')!r} not found")
+    files = {key: path for key, path in paths.items() if path and os.path.exists(path)}
+    model_sha256 = file_digest(files['model'])
+    if 'compiled' in files:
+        from compiled_model import CompiledStackingModel
+
+        CompiledStackingModel.load_mmap(files['compiled']).check_model(model_sha256)
+    version = version or time.strftime('%Y%m%d-%H%M%S-') + model_sha256[:8]
+    target = os.path.join(directory, version)
+    if os.path.exists(target):
+        raise ValueError(f'{target} already exists')
+
+    staging = os.path.join(directory, f'.{version}.tmp')
+    os.makedirs(staging)
+    manifest = {
+        'version': version,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'feature_columns': FEATURE_COLUMNS,
+        'emoji_table': EMOJI_TABLE,
+        'files': {},
+        **info,
+    }
+    for key, path in files.items():
+        name = BUNDLE_FILES[key]
+        shutil.copyfile(path, os.path.join(staging, name))
+        manifest['files'][name] = {'sha256': file_digest(path), 'size': os.path.getsize(path)}
+    with open(os.path.join(staging, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    # the version directory appears complete or not at all
+    os.rename(staging, target)
+    if make_current:
+        activate(directory, version)
+    return version
+
+
+def verify(path):
+    """Returns the manifest of the bundle at `path`, or raises ValueError if it doesn't check out"""
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get('feature_columns') != FEATURE_COLUMNS:
+        raise ValueError(f"{path} was built for features {manifest.get('feature_columns')}, "
+                         f'this code computes {FEATURE_COLUMNS}')
+    # bundles from before the table was recorded were all trained on the legacy one
+    if manifest.get('emoji_table', 'legacy') != EMOJI_TABLE:
+        raise ValueError(f"{path} counts emojis with the {manifest.get('emoji_table', 'legacy')!r} table, "
+                         f'this process uses TIE_EMOJI_TABLE={EMOJI_TABLE!r}')
+    if BUNDLE_FILES['model'] not in manifest['files']:
+        raise ValueError(f'{path} has no model')
+    for name, expected in manifest['files'].items():
+        file_path = os.path.join(path, name)
+        if not os.path.exists(file_path) or os.path.getsize(file_path) != expected['size'] \
+                or file_digest(file_path) != expected['sha256']:
+            raise ValueError(f'{file_path} does not match the manifest')
+    return manifest
+
+
+class Bundle:
+    """One loaded model version: the model plus the lookup tables its features need"""
+
+    def __init__(self, version, model, tfidf_vocab=None, company_index=None, manifest=None, path=None):
+        self.version = version
+        self.model = model
+        self.tfidf_vocab = tfidf_vocab
+        self.company_index = company_index
+        self.manifest = manifest or {}
+        self.path = path
+
+    def file(self, key):
+        """Path of one of the bundle's files, or None if it doesn't have it"""
+        if self.path is None or BUNDLE_FILES[key] not in self.manifest.get('files', {}):
+            return None
+        return os.path.join(self.path, BUNDLE_FILES[key])
+
+    def model_sha256(self):
+        """SHA-256 of the bundle's pickled model, from the manifest"""
+        return self.manifest['files'][BUNDLE_FILES['model']]['sha256']
+
+    def require(self, key):
+        """file(key), or ValueError if the bundle doesn't have it"""
+        path = self.file(key)
+        if path is None:
+            raise ValueError(f'bundle {self.version} has no {BUNDLE_FILES[key]}')
+        return path
+
+    @classmethod
+    def load(cls, path, load_model=None):
+        """Verifies and loads the bundle at `path`; load_model(bundle) can replace joblib.load"""
+        import joblib
+
+        from company_stats import CompanyIndex, sample_index
+        from tfidf import TfidfVocabulary
+
+        manifest = verify(path)
+        bundle = cls(manifest['version'], None, manifest=manifest, path=path)
+        bundle.model = load_model(bundle) if load_model else joblib.load(bundle.require('model'))
+        if bundle.file('tfidf'):
+            bundle.tfidf_vocab = TfidfVocabulary.load(bundle.file('tfidf'))
+        bundle.company_index = CompanyIndex.load(bundle.file('companies')) if bundle.file('companies') else sample_index()
+        return bundle
+
+
+class FixedBundle:
+    """BundleWatcher's interface for a bundle that never changes (no bundle directory)"""
+
+    reloads = 0
+    reload_errors = 0
+
+    def __init__(self, bundle):
+        self.active = bundle
+
+
+class BundleWatcher:
+    """Keeps `active` pointed at the newest loadable bundle in `directory`.
+
+    load(path) -> Bundle does the loading and warming; it runs on the watcher thread, so
+    requests keep being served by the current bundle meanwhile. Like MicroBatcher, the
+    thread is started lazily in whichever process first reads `active`, so an instance
+    created before gunicorn forks still polls in every worker.
+    """
+
+    def __init__(self, directory, load, interval=5.0, log=sys.stderr):
+        self.directory = directory
+        self.load = load
+        self.interval = interval
+        self.log = log
+        self.reloads = 0
+        self.reload_errors = 0
+        self._failed = None
+        self._pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+        version = current_version(directory)
+        if version is None:
+            raise ValueError(f'{directory} has no {CURRENT} bundle; run `python model_bundle.py publish` first')
+        self._active = load(os.path.join(directory, version))
+
+    @property
+    def active(self):
+        self._ensure_started()
+        return self._active
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='bundle-watcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.interval)
+            self.check()
+
+    def check(self):
+        """Loads and swaps in CURRENT if it changed; returns True when it swapped"""
+        version = current_version(self.directory)
+        if version is None or version == self._active.version or version == self._failed:
+            return False
+        start = time.perf_counter()
+        try:
+            bundle = self.load(os.path.join(self.directory, version))
+        except Exception as e:
+            # don't retry the same broken version every poll; a new CURRENT is tried again
+            self._failed = version
+            self.reload_errors += 1
+            print(f'[pid {os.getpid()}] bundle {version} failed to load, still serving '
+                  f'{self._active.version}: {e}', file=self.log)
+            return False
+        # one reference assignment: a request sees either the old bundle or the new one
+        self._active = bundle
+        self.reloads += 1
+        print(f'[pid {os.getpid()}] now serving bundle {version} '
+              f'(loaded and warmed in {time.perf_counter() - start:.1f}s)', file=self.log)
+        return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Publish and manage versioned model bundles.')
+    parser.add_argument('command', choices=['publish', 'list', 'activate', 'verify'])
+    parser.add_argument('version', nargs='?')
+    parser.add_argument('--dir', default=os.environ.get('TIE_BUNDLE_DIR', 'bundles'))
+    parser.add_argument('--no-activate', action='store_true', help='publish without making it CURRENT')
+    parser.add_argument('--compiled', help='also publish this compiled artifact (it must match the model)')
+    args = parser.parse_args()
+
+    if args.command == 'publish':
+        os.makedirs(args.dir, exist_ok=True)
+        paths = {key: name for key, name in BUNDLE_FILES.items() if key != 'compiled'}
+        if args.compiled:
+            paths['compiled'] = args.compiled
+        version = publish(args.dir, paths, version=args.version, make_current=not args.no_activate)
+        print(f'published {version}' + ('' if args.no_activate else ' (now CURRENT)'))
+    elif args.command == 'list':
+        active = current_version(args.dir)
+        for version in list_versions(args.dir):
+            print(('* ' if version == active else '  ') + version)
+    elif args.command == 'activate':
+        activate(args.dir, args.version)
+        print(f'CURRENT -> {args.version}')
+    else:
+        version = args.version or current_version(args.dir)
+        verify(os.path.join(args.dir, version))
+        print(f'{version}: ok')
@@ -1,36 +1,60 @@
 import os
-from flask import Flask, render_template_string, request
+import sys
+import threading
+import time
+from flask import Flask, Response, abort, g, has_request_context, jsonify, request
 import joblib
 import numpy as np
-import re
-from textblob import TextBlob
-from sklearn.preprocessing import LabelEncoder
+import company_stats
+from compiled_model import CompiledStackingModel
+from features import (FEATURE_COLUMNS, POLARITY_BACKEND, POLARITY_BACKENDS, FeatureExtractor, get_polarity,
+                      polarity_cache)
+from metrics import Metrics
+from micro_batcher import MicroBatcher
+from model_bundle import Bundle, BundleWatcher, FixedBundle, file_digest
+from static_assets import StaticAssets
+from tfidf import TfidfVocabulary
 from tweet_generator import SimpleTweetGenerator
 
-app = Flask(__name__)
-
-#  the pickle file was too big for github , so compressed it
-model = joblib.load('like_predictor.pkl')
-
-# Dummy company encoder - radded some samples
-company_encoder = LabelEncoder()
-company_encoder.fit(['nike', 'starbucks', 'apple', 'tesla', 'our company'])
-
-def encode_sentiment(sentiment_str):
-    if sentiment_str == "Positive":
-        return (0, 1)
-    elif sentiment_str == "Negative":
-        return (1, 0)
-    else:
-        return (0, 0)
-
-company_avg_likes_map = {
-    'nike': 150,
-    'starbucks': 100,
-    'apple': 200,
-    'tesla': 180,
-    'our company': 120
-}
+# static/ is served by StaticAssets below (fingerprinted + precompressed), not Flask's default route
+app = Flask(__name__, static_folder=None)
+
+MODEL_PATH = os.environ.get('TIE_MODEL_PATH', 'like_predictor.pkl')
+COMPILED_MODEL_PATH = os.environ.get('TIE_COMPILED_MODEL_PATH', 'like_predictor_compiled.joblib')
+TFIDF_PATH = os.environ.get('TIE_TFIDF_PATH', 'tfidf_vocab.npz')
+# versioned bundles (model_bundle.py) that workers hot-reload when CURRENT changes;
+# unset, the loose files above are loaded once like before
+BUNDLE_DIR = os.environ.get('TIE_BUNDLE_DIR')
+
+def artifact_path(bundle, key, loose_path):
+    # only local_bundle() reads loose files from the working directory; a versioned
+    # bundle that lacks the artifact fails to load instead of mixing in stray files
+    return loose_path if bundle.path is None else bundle.require(key)
+
+def load_model(bundle):
+    if os.environ.get('TIE_MMAP_MODEL') == '1':
+        # uncompressed compiled artifact written by SJ_model_week3.py (TIE_MMAP_ARTIFACT=1);
+        # its node arrays are memory-mapped, so every worker shares the same pages
+        compiled = CompiledStackingModel.load_mmap(artifact_path(bundle, 'compiled', COMPILED_MODEL_PATH))
+        # it is never compared with model.predict here, so it has to come from this model
+        if bundle.path is not None:
+            compiled.check_model(bundle.model_sha256())
+        elif os.path.exists(MODEL_PATH):
+            compiled.check_model(file_digest(MODEL_PATH))
+        return compiled
+    #  the pickle file was too big for github , so compressed it
+    return joblib.load(artifact_path(bundle, 'model', MODEL_PATH))
+
+def local_bundle():
+    bundle = Bundle('local', None)
+    bundle.model = load_model(bundle)
+    # written by SJ_model_week3.py next to the model; without it tfidf_mean stays at the old constant
+    bundle.tfidf_vocab = TfidfVocabulary.load(TFIDF_PATH) if os.path.exists(TFIDF_PATH) else None
+    bundle.company_index = company_stats.company_index
+    return bundle
+
+# upper bound on jobs per /api/predict call so one client can't hog a worker
+MAX_API_JOBS = int(os.environ.get('MAX_API_JOBS', 1000))
 
 PAGE_TEMPLATE = '''
 <!DOCTYPE html>
@@ -42,424 +66,7 @@ PAGE_TEMPLATE = '''
   <!-- Use Playfair Display from Google Fonts -->
   <link rel="preconnect" href="https://fonts.googleapis.com" />
   <link rel="stylesheet" href="https://fonts.googleapis.com/css?family=Playfair+Display:wght@700;900&display=swap" />
-  <style>
-    :root {
-      /* Light mode colors */
-      --bg-gradient1: #fd5b63;
-      --bg-gradient2: #fca845;
-      --bg-gradient3: #fda43a;
-      --outer-bg: rgba(255,255,255,0.10);
-      --outer-border: #fc477d70;
-      --outer-shadow1: #d5845d23;
-      --outer-shadow2: #fd5b6387;
-      --dot1: #ffffff26;
-      --dot2: #fca8454d;
-      --dot3: #fd5b635c;
-      --container-bg: rgba(255, 255, 255, 0.08);
-      --container-text: #231b16;
-      --container-shadow1: #652c9080;
-      --container-shadow2: #ffbf9d24;
-      --container-border-gradient-start: #fc477d;
-      --container-border-gradient-mid: #fca845;
-      --container-border-gradient-end: #fd5b63;
-      --emoji-bar-color: #231b16;
-      --emoji-bar-shadow: #fc477d60;
-      --heading-color: #231b16;
-      --heading-shadow1: #ffec8c60;
-      --heading-shadow2: #ffe32540;
-      --label-color: #231b16;
-      --input-bg: rgba(250, 248, 255, 0.15);
-      --input-border: #fda1f5;
-      --input-text: #231b16;
-      --input-placeholder: #7c6d6daa;
-      --focus-border: #fd5b63;
-      --focus-bg: rgba(255, 255, 255, 0.95);
-      --focus-shadow: #fc477d88;
-      --checkbox-label-color: #231b16;
-      --checkbox-accent: #fc477d;
-      --button-bg-gradient-start: #fc477d;
-      --button-bg-gradient-end: #fca845;
-      --button-text: #231b16;
-      --button-shadow1: #fd5b637c;
-      --button-shadow2: #fd5b6331;
-      --button-hover-gradient-start: #fca845;
-      --button-hover-gradient-end: #fd5b63;
-      --button-hover-shadow1: #ff6f794b;
-      --button-hover-shadow2: #ff725940;
-      --button-active-shadow1: #d04d567d;
-      --button-active-shadow2: #d0475267;
-      --box-bg: rgba(255, 220, 240, 0.12);
-      --box-border: #fc477d66;
-      --box-shadow: #ffc78545;
-      --selection-bg: rgba(253, 91, 99, 0.26);
-      --svg-fill1: #fff9;
-      --svg-fill2: #231b16;
-      --svg-fill3: #fff;
-    }
-
-    .dark-mode {
-      /* Dark mode colors */
-      --bg-gradient1: #662b2b;
-      --bg-gradient2: #6a4a27;
-      --bg-gradient3: #9e6b21;
-      --outer-bg: rgba(38, 38, 38, 0.6);
-      --outer-border: #a8435f70;
-      --outer-shadow1: #391c1c70;
-      --outer-shadow2: #6f2d3e87;
-      --dot1: #ffffff40;
-      --dot2: #9470347f;
-      --dot3: #a943434c;
-      --container-bg: rgba(30, 30, 30, 0.85);
-      --container-text: #eee;
-      --container-shadow1: #8e427a80;
-      --container-shadow2: #cc996333;
-      --container-border-gradient-start: #a8435f;
-      --container-border-gradient-mid: #c2702e;
-      --container-border-gradient-end: #9e6b21;
-      --emoji-bar-color: #eee;
-      --emoji-bar-shadow: #a8435f60;
-      --heading-color: #eee;
-      --heading-shadow1: #9e7f1a60;
-      --heading-shadow2: #c0a74540;
-      --label-color: #eee;
-      --input-bg: rgba(60, 60, 60, 0.3);
-      --input-border: #c273a1;
-      --input-text: #eee;
-      --input-placeholder: #bbaaccaa;
-      --focus-border: #c2702e;
-      --focus-bg: rgba(50, 50, 50, 0.9);
-      --focus-shadow: #a8435f88;
-      --checkbox-label-color: #eee;
-      --checkbox-accent: #bd5b63;
-      --button-bg-gradient-start: #a8435f;
-      --button-bg-gradient-end: #c2702e;
-      --button-text: #eee;
-      --button-shadow1: #971e334d;
-      --button-shadow2: #7c3e2c31;
-      --button-hover-gradient-start: #c2702e;
-      --button-hover-gradient-end: #a8435f;
-      --button-hover-shadow1: #a8435f6e;
-      --button-hover-shadow2: #c2702e6e;
-      --button-active-shadow1: #6419287d;
-      --button-active-shadow2: #97323267;
-      --box-bg: rgba(80, 40, 40, 0.25);
-      --box-border: #a8475a66;
-      --box-shadow: #a8687745;
-      --selection-bg: rgba(180, 110, 110, 0.26);
-      --svg-fill1: #eee9;
-      --svg-fill2: #eee;
-      --svg-fill3: #ddd;
-    }
-
-    body {
-      margin: 0;
-      padding: 0;
-      min-height: 100vh;
-
-      /* Use gradients from css variables */
-      background:
-        repeating-linear-gradient(135deg, rgba(255,255,255,0.07) 0 1px, transparent 1px 40px),
-        linear-gradient(135deg, var(--bg-gradient1) 0%, var(--bg-gradient2) 50%, var(--bg-gradient3) 100%);
-      font-family: 'Playfair Display', serif;
-      display: flex;
-      align-items: center;
-      justify-content: center;
-      -webkit-font-smoothing: antialiased;
-      -moz-osx-font-smoothing: grayscale;
-      position: relative;
-      overflow-x: hidden;
-      color: var(--container-text);
-      transition: background 0.5s ease, color 0.5s ease;
-    }
-
-
-    /* Outer box styling - enclosure for entire UI */
-    .outer-box {
-      background: var(--outer-bg);
-      border: 3.5px solid var(--outer-border);
-      border-radius: 34px;
-      box-shadow: 0 10px 48px var(--outer-shadow1), 0 2px 8px var(--outer-shadow2);
-      padding: 32px 20px;
-      margin: 36px 0;
-      position: relative;
-      max-width: 540px;
-      width: 98vw;
-      z-index: 2;
-      display: flex;
-      flex-direction: column;
-      align-items: center;
-      transition: background 0.5s ease, border-color 0.5s ease, box-shadow 0.5s ease;
-    }
-
-
-    /* Background floating dots */
-    .background-dots {
-      position: fixed;
-      top: 0; left: 0; width: 100vw; height: 100vh;
-      pointer-events: none;
-      z-index: 0;
-      background-image:
-        radial-gradient(circle at 10% 20%, var(--dot1) 6px, transparent 7px),
-        radial-gradient(circle at 80% 10%, var(--dot2) 7px, transparent 8px),
-        radial-gradient(circle at 50% 70%, var(--dot3) 9px, transparent 10px);
-      background-repeat: no-repeat;
-      background-size: cover;
-      animation: dots-move 15s linear infinite alternate;
-      transition: background 0.5s ease;
-    }
-    @keyframes dots-move {
-      from {
-        background-position: 0% 0%, 100% 20%, 50% 80%;
-      }
-      to {
-        background-position: 100% 10%, 90% 100%, 80% 20%;
-      }
-    }
-
-
-    /* Container with animated gradient border */
-    .container {
-      position: relative;
-      z-index: 2; /* Above backgrounds */
-      max-width: 410px;
-      width: 100%;
-      padding: 48px 36px 60px;
-      background: var(--container-bg);
-      border-radius: 2em;
-      color: var(--container-text);
-      text-align: center;
-      font-family: 'Playfair Display', serif;
-      box-shadow:
-        0 6px 34px 12px var(--container-shadow1),
-        0 2px 10px var(--container-shadow2);
-      backdrop-filter: blur(8.5px);
-      animation: fadein 1.2s cubic-bezier(.17,.67,.83,.67);
-
-      border: 4px solid transparent;
-      background-origin: border-box;
-      background-clip: padding-box, border-box;
-      background-image:
-        linear-gradient(to right, var(--container-bg), var(--container-bg)),
-        linear-gradient(90deg, var(--container-border-gradient-start), var(--container-border-gradient-mid) 50%, var(--container-border-gradient-end));
-      transition: box-shadow 0.3s ease, background 0.5s ease, color 0.5s ease;
-    }
-    .container:hover {
-      box-shadow:
-        0 6px 34px 15px #ff7f5080,
-        0 3px 15px #ffa35c40;
-    }
-    @keyframes fadein {
-      from {
-        opacity: 0;
-        transform: translateY(60px);
-      }
-      to {
-        opacity: 1;
-        transform: translateY(0);
-      }
-    }
-
-
-    /* Emoji Bar */
-    .emoji-bar {
-      font-size: 2em;
-      margin-bottom: 14px;
-      text-align: center;
-      letter-spacing: 2px;
-      filter: drop-shadow(0 2px 5px var(--emoji-bar-shadow));
-      color: var(--emoji-bar-color);
-      font-family: 'Playfair Display', serif;
-      user-select: none;
-      position: relative;
-      z-index: 2;
-      transition: color 0.5s ease, filter 0.5s ease;
-    }
-
-
-    /* Title */
-    h1 {
-      color: var(--heading-color);
-      text-shadow: 0 4px 16px var(--heading-shadow1), 0 1.5px 3px var(--heading-shadow2);
-      font-size: 2.8em;
-      letter-spacing: 1.5px;
-      margin-bottom: 14px;
-      font-weight: 900;
-      font-family: 'Playfair Display', serif;
-      position: relative;
-      z-index: 2;
-      transition: color 0.5s ease, text-shadow 0.5s ease;
-    }
-
-
-    /* FORM: vertical layout and full width fields */
-    form {
-      display: flex;
-      flex-direction: column;
-      gap: 16px;
-      width: 100%;
-    }
-
-
-    label {
-      display: flex;
-      flex-direction: column;
-      gap: 6px;
-      font-weight: 700;
-      color: var(--label-color);
-      font-family: 'Playfair Display', serif;
-      font-size: 1.05em;
-      transition: color 0.5s ease;
-    }
-
-
-    input[type="text"],
-    input[type="number"],
-    select {
-      width: 100%;
-      box-sizing: border-box;
-      font-size: 1.12em;
-      padding: 14px 16px;
-      border-radius: 10px;
-      border: 1.8px solid var(--input-border);
-      background: var(--input-bg);
-      color: var(--input-text);
-      font-weight: 700;
-      font-family: 'Playfair Display', serif;
-      outline-offset: 2px;
-      outline: none;
-      box-shadow: inset 0 1px 3px rgba(0,0,0,0.08);
-      transition:
-        border-color 0.3s ease,
-        background-color 0.3s ease,
-        box-shadow 0.3s ease,
-        color 0.5s ease;
-    }
-
-
-    input::placeholder {
-      color: var(--input-placeholder);
-      font-style: italic;
-      transition: color 0.5s ease;
-    }
-
-
-    input[type="text"]:focus,
-    input[type="number"]:focus,
-    select:focus {
-      border-color: var(--focus-border);
-      background: var(--focus-bg);
-      color: var(--input-text);
-      box-shadow: 0 0 8px 2px var(--focus-shadow);
-      outline: none;
-      transition: border-color 0.3s ease, background-color 0.3s ease, box-shadow 0.3s ease, color 0.5s ease;
-    }
-
-
-    /* Checkbox label with horizontal alignment */
-    .checkbox-label {
-      display: flex;
-      flex-direction: row;
-      align-items: center;
-      gap: 10px;
-      font-weight: 700;
-      color: var(--checkbox-label-color);
-      font-family: 'Playfair Display', serif;
-      font-size: 1em;
-      user-select: none;
-      transition: color 0.5s ease;
-    }
-
-
-    input[type="checkbox"] {
-      accent-color: var(--checkbox-accent);
-      width: 22px;
-      height: 22px;
-      border-radius: 6px;
-      vertical-align: middle;
-      margin: 0;
-      cursor: pointer;
-      transition: accent-color 0.2s ease;
-    }
-    input[type="checkbox"]:focus {
-      outline-offset: 2px;
-      outline: 2px solid var(--focus-border);
-    }
-
-
-    /* Button */
-    button {
-      margin-top: 26px;
-      background: linear-gradient(90deg, var(--button-bg-gradient-start), var(--button-bg-gradient-end) 90%);
-      border: none;
-      border-radius: 12px;
-      color: var(--button-text);
-      font-weight: 900;
-      font-size: 1.32em;
-      letter-spacing: 0.6px;
-      padding: 16px 0;
-      box-shadow: 0 6px 18px var(--button-shadow1), 0 2px 12px var(--button-shadow2);
-      cursor: pointer;
-      font-family: 'Playfair Display', serif;
-      transition: background 0.3s ease, box-shadow 0.3s ease, color 0.3s ease;
-      user-select: none;
-      text-transform: uppercase;
-      letter-spacing: 0.1em;
-      position: relative;
-      z-index: 2;
-    }
-    button:hover {
-      background: linear-gradient(100deg, var(--button-hover-gradient-start), var(--button-hover-gradient-end));
-      box-shadow: 0 8px 22px var(--button-hover-shadow1), 0 3px 15px var(--button-hover-shadow2);
-    }
-    button:active {
-      transform: scale(0.97);
-      box-shadow: 0 4px 14px var(--button-active-shadow1), 0 1px 7px var(--button-active-shadow2);
-    }
-
-
-    /* Result, Warning, Error Boxes */
-    .result, .warning, .error {
-      margin-top: 32px;
-      text-align: left;
-      font-size: 16px;
-      border-radius: 14px;
-      padding: 20px 22px 14px;
-      word-break: break-word;
-      color: var(--container-text);
-      border: 2.5px solid var(--box-border);
-      background: var(--box-bg);
-      box-shadow: 0 0 18px var(--box-shadow);
-      font-family: 'Playfair Display', serif;
-      user-select: text;
-      position: relative;
-      z-index: 2;
-      transition: background 0.5s ease, border-color 0.5s ease, color 0.5s ease, box-shadow 0.5s ease;
-    }
-    .result p strong {
-      font-size: 1.22em;
-    }
-
-
-    /* Text Selection color */
-    ::selection {
-      background: var(--selection-bg);
-    }
-
-    /* SVG fills in decorative elements */
-    svg > circle {
-      fill: var(--svg-fill1);
-      transition: fill 0.5s ease;
-    }
-    svg > ellipse {
-      fill: var(--svg-fill2);
-      transition: fill 0.5s ease;
-    }
-    svg > rect {
-      fill: var(--svg-fill3);
-      transition: fill 0.5s ease;
-    }
-
-  </style>
+  <link rel="stylesheet" href="{{ asset_url('style.css') }}" />
 </head>
 <body>
   <div class="outer-box" role="main">
@@ -515,6 +122,14 @@ PAGE_TEMPLATE = '''
           <input id="has_media" type="checkbox" name="has_media" {% if has_media %}checked{% endif %} />
           Includes media? <span aria-hidden="true">👀</span>
         </label>
+        <label class="checkbox-label" for="best_tweet">
+          <input id="best_tweet" type="checkbox" name="best_tweet" {% if best_tweet %}checked{% endif %} />
+          Try every template, keep the best <span aria-hidden="true">🏆</span>
+        </label>
+        <label class="checkbox-label" for="best_hour">
+          <input id="best_hour" type="checkbox" name="best_hour" {% if best_hour %}checked{% endif %} />
+          Find the best hour to post <span aria-hidden="true">⏰</span>
+        </label>
         <label for="hour">Hour to Post (0-23):
           <input
             id="hour"
@@ -541,6 +156,28 @@ PAGE_TEMPLATE = '''
             <p><strong>Predicted Likes:</strong>
               <span style="font-size:1.25em;">{{ response.predicted_likes }} 👍</span>
             </p>
+            {% if response.hour_curve %}
+              <hr />
+              <p><strong>Best Hour:</strong>
+                <span style="font-size:1.25em;">{{ '%02d:00'|format(response.best_hour) }} ⏰</span>
+              </p>
+              <div class="hour-curve" aria-label="Predicted likes by hour">
+                {% for point in response.hour_curve %}
+                  <div class="hour-bar{% if point.hour == response.best_hour %} best{% endif %}"
+                       style="height: {{ (100 * point.predicted_likes / response.max_likes)|round|int if point.predicted_likes > 0 else 0 }}%;"
+                       title="{{ '%02d:00'|format(point.hour) }}: {{ point.predicted_likes }} likes"></div>
+                {% endfor %}
+              </div>
+            {% endif %}
+            {% if response.alternatives %}
+              <hr />
+              <p><strong>Runners-up:</strong></p>
+              <ul>
+                {% for alt in response.alternatives %}
+                  <li>"{{ alt.generated_tweet }}" — {{ alt.predicted_likes }} 👍</li>
+                {% endfor %}
+              </ul>
+            {% endif %}
           </div>
         {% else %}
           <div class="warning" role="alert">⚠️ <strong>Warning:</strong> Tweet generation was not successful.<br>
@@ -553,77 +190,7 @@ PAGE_TEMPLATE = '''
     </div>
   </div>
 
-  <script>
-    // Initialize mode based on localStorage or default to light mode
-    const body = document.body;
-    const toggleBtn = document.getElementById('toggle-dark-mode');
-    const darkModeClass = 'dark-mode';
-
-    function updateToggleButtonText() {
-      if(body.classList.contains(darkModeClass)) {
-        toggleBtn.textContent = 'Toggle to Light Mode';
-      } else {
-        toggleBtn.textContent = 'Toggle to Dark Mode';
-      }
-    }
-
-    toggleBtn.addEventListener('click', () => {
-      body.classList.toggle(darkModeClass);
-      if(body.classList.contains(darkModeClass)) {
-        localStorage.setItem('mode', 'dark');
-      } else {
-        localStorage.setItem('mode', 'light');
-      }
-      updateToggleButtonText();
-    });
-
-    // On page load, set the mode based on saved preferences
-    window.addEventListener('DOMContentLoaded', () => {
-      const savedMode = localStorage.getItem('mode');
-      if(savedMode === 'dark') {
-        body.classList.add(darkModeClass);
-      } else {
-        body.classList.remove(darkModeClass);
-      }
-      updateToggleButtonText();
-    });
-  </script>
-
-  <style>
-    /* Pulse button animation */
-    .pulse-btn {
-      animation: pulse 1.2s infinite;
-    }
-    @keyframes pulse {
-      0% {
-        box-shadow: 0 0 0 0 #61dafb33;
-      }
-      70% {
-        box-shadow: 0 0 0 10px transparent;
-      }
-      100% {
-        box-shadow: 0 0 0 0 transparent;
-      }
-    }
-    /* Add small margin to dark mode toggle button */
-    #toggle-dark-mode {
-      margin-top: 12px;
-      background: none;
-      border: 2.5px solid var(--button-bg-gradient-start);
-      color: var(--button-bg-gradient-start);
-      font-family: 'Playfair Display', serif;
-      font-weight: 700;
-      font-size: 1em;
-      border-radius: 10px;
-      padding: 8px 16px;
-      cursor: pointer;
-      transition: background 0.3s ease, color 0.3s ease;
-    }
-    #toggle-dark-mode:hover {
-      background: var(--button-bg-gradient-start);
-      color: var(--button-text);
-    }
-  </style>
+  <script src="{{ asset_url('app.js') }}"></script>
 </body>
 </html>
 '''
@@ -632,46 +199,331 @@ PAGE_TEMPLATE = '''
 
 
 
+static_assets = StaticAssets(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+app.jinja_env.globals['asset_url'] = static_assets.url
+# compiled once here instead of on every render_template_string call
+page_template = app.jinja_env.from_string(PAGE_TEMPLATE)
+
 tweet_generator = SimpleTweetGenerator()
+feature_extractor = FeatureExtractor()
+
+# per-stage latency histograms and request counters, served at /metrics; with
+# TIE_METRICS_DIR set every gunicorn worker drops a snapshot there and /metrics sums them
+metrics = Metrics(os.environ.get('TIE_METRICS_DIR') or None)
+
+def parse_hour(value):
+    # anything outside 0-23 (or not a number) falls back to noon; JSON's 1e400 is inf,
+    # which int() refuses with OverflowError
+    try:
+        hour = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return 12
+    return hour if 0 <= hour <= 23 else 12
+
+TRUE_FLAGS = {'on', 'true', '1', 'yes'}
+FALSE_FLAGS = {'off', 'false', '0', 'no', ''}
+
+def parse_flag(value, name):
+    # JSON true/false, or the strings a form or query string would send ('on', 'false', '0' ...)
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        flag = value.strip().lower()
+        if flag in TRUE_FLAGS:
+            return True
+        if flag in FALSE_FLAGS:
+            return False
+    raise ValueError(f'{name} must be true or false.')
+
+def generate_for(company, tweet_type, message, with_features=False):
+    # Pass topic only for certain tweet types
+    topic = message if tweet_type in ['question', 'tip'] else None
+
+    # with_features=True also returns the tweet's word/char/emoji/hashtag/url counts,
+    # from the template's precomputed skeleton (for build_feature_row's `lexical`)
+    with metrics.timer('tie_stage_duration_seconds', stage='generate'):
+        return tweet_generator.generate_tweet(
+            company=company.title(),
+            tweet_type=tweet_type,
+            message=message if message else None,
+            topic=topic if topic else None,
+            with_features=with_features
+        )
+
+def parse_job(job, allow_all=False):
+    """Normalizes one JSON job into (company, tweet_type, message, has_media, hour).
+
+    Raises ValueError when has_media isn't a boolean (or a string like "false").
+    """
+    company = str(job.get('company') or '').strip().lower()
+    tweet_type = str(job.get('tweet_type') or 'announcement').strip().lower()
+    message = str(job.get('message') or '').strip()
+    has_media = parse_flag(job.get('has_media', False), 'has_media')
+    hour = parse_hour(job.get('hour', 12))
+
+    if tweet_type not in tweet_generator.get_supported_tweet_types() and not (allow_all and tweet_type == 'all'):
+        tweet_type = 'general'
+    return company, tweet_type, message, has_media, hour
+
+def current_bundle():
+    """The model bundle for this request, picked once when the request starts"""
+    if not has_request_context():
+        return models.active
+    if 'bundle' not in g:
+        g.bundle = models.active
+    return g.bundle
+
+def build_feature_row(generated_tweet, company, has_media, hour, bundle=None, lexical=None):
+    """Returns the model features for one generated tweet, in FEATURE_COLUMNS order.
+
+    `lexical` is the tweet's scan() counts when the generator already has them.
+    """
+    bundle = bundle or current_bundle()
+    with metrics.timer('tie_stage_duration_seconds', stage='company_encode'):
+        company_encoded, company_avg_likes = bundle.company_index.lookup(company)
+
+    with metrics.timer('tie_stage_duration_seconds', stage='polarity'):
+        polarity = get_polarity(generated_tweet)
+
+    with metrics.timer('tie_stage_duration_seconds', stage='tfidf'):
+        tfidf_mean = bundle.tfidf_vocab.tfidf_mean(generated_tweet) if bundle.tfidf_vocab is not None else 0.1
+
+    # word/char counts and the emoji/url/hashtag regexes, unless `lexical` has them
+    with metrics.timer('tie_stage_duration_seconds', stage='text_features'):
+        return feature_extractor.transform_one(
+            generated_tweet,
+            has_media=has_media,
+            hour=hour,
+            company_encoded=company_encoded,
+            company_avg_likes=company_avg_likes,
+            tfidf_mean=tfidf_mean,
+            polarity=polarity,
+            lexical=lexical
+        )
+
+def rank_candidates(company, tweet_type, message, has_media, hour, top_k=3, with_rows=False):
+    """Renders every template for tweet_type ('all' for every type) and scores them in one predict call.
+
+    Returns (top_k best candidates, number of candidates scored), plus their feature
+    rows in the same order when with_rows=True.
+    """
+    candidates = tweet_generator.generate_candidates(
+        company.title(),
+        tweet_type=None if tweet_type == 'all' else tweet_type,
+        message=message if message else None,
+        # only the question/tip templates have a {topic} slot, same as generate_for
+        topic=message if message else None
+    )
+    rows = np.array([build_feature_row(c['tweet'], company, has_media, hour, lexical=c['lexical']) for c in candidates])
+    predictions = predict_rows(rows)
+    best = np.argsort(-predictions, kind='stable')[:max(int(top_k), 1)]
+    ranked = [
+        {
+            'tweet_type': candidates[i]['tweet_type'],
+            'generated_tweet': candidates[i]['tweet'],
+            'predicted_likes': int(round(predictions[i]))
+        }
+        for i in best
+    ]
+    if with_rows:
+        return ranked, len(candidates), rows[best]
+    return ranked, len(candidates)
+
+HOUR_COLUMN = FEATURE_COLUMNS.index('hour')
+
+def sweep_hours(row):
+    """Predicts one feature row at every hour 0-23 in a single predict call.
+
+    The row's text features are reused as-is; only the hour column changes.
+    Returns (best hour, list of {'hour', 'predicted_likes'}).
+    """
+    rows = np.repeat(np.array([row], dtype=np.float64), 24, axis=0)
+    rows[:, HOUR_COLUMN] = np.arange(24)
+    predictions = predict_rows(rows)
+    best_hour = int(np.argmax(predictions))
+    return best_hour, [
+        {'hour': hour, 'predicted_likes': int(round(predicted_likes))}
+        for hour, predicted_likes in enumerate(predictions)
+    ]
+
+def prepare_bundle(bundle):
+    """Gets a freshly loaded bundle ready to serve, before any request can see it"""
+    # none of this is traffic, so it stays out of the stage histograms
+    with metrics.suspended():
+        rows = np.array([
+            build_feature_row(generate_for('nike', tt, ''), 'nike', hour % 2 == 0, hour, bundle)
+            for hour, tt in enumerate(tweet_generator.get_supported_tweet_types())
+        ])
+        # TIE_COMPILED_MODEL=1 swaps sklearn's predict for the flat-array evaluator in
+        # compiled_model.py, after checking it agrees with the pickled model on a few tweets
+        if os.environ.get('TIE_COMPILED_MODEL') == '1' and not isinstance(bundle.model, CompiledStackingModel):
+            compiled_model = CompiledStackingModel(bundle.model)
+            compiled_model.verify(bundle.model, rows)
+            bundle.model = compiled_model
+        # the first predict pays for lazy setup (thread pools, page faults); not a user's request
+        bundle.model.predict(rows)
+    return bundle
+
+def load_bundle(path):
+    return prepare_bundle(Bundle.load(path, load_model))
+
+if BUNDLE_DIR:
+    models = BundleWatcher(BUNDLE_DIR, load_bundle, interval=float(os.environ.get('TIE_BUNDLE_POLL_SECONDS', 5)))
+else:
+    models = FixedBundle(prepare_bundle(local_bundle()))
+
+# TIE_MICRO_BATCH=1 sends the form's single-row predicts through a shared queue so
+# concurrent requests in a worker are scored by one vectorized predict call
+batcher = None
+# seconds a request waits for the batcher before it gives up with an error
+BATCH_TIMEOUT = float(os.environ.get('TIE_BATCH_TIMEOUT_S', 10))
+if os.environ.get('TIE_MICRO_BATCH') == '1':
+    batcher = MicroBatcher(
+        lambda X, bundle: predict_rows(X, stage='batch_predict', bundle=bundle),
+        max_batch_size=int(os.environ.get('TIE_BATCH_SIZE', 32)),
+        max_wait_ms=float(os.environ.get('TIE_BATCH_WAIT_MS', 2))
+    )
 
-def get_polarity(text):
-    return TextBlob(str(text)).sentiment.polarity
-
-def get_sentiment(polarity):
-    if polarity > 0:
-        return 'Positive'
-    elif polarity < 0:
-        return 'Negative'
-    else:
-        return 'Neutral'
-
-def count_emojis(text):
-    emoji_pattern = re.compile(
-        "["
-        "\U0001F600-\U0001F64F"
-        "\U0001F300-\U0001F5FF"
-        "\U0001F680-\U0001F6FF"
-        "\U0001F1E0-\U0001F1FF"
-        "]+", flags=re.UNICODE)
-    return len(emoji_pattern.findall(str(text)))
-
-def has_hashtag(text):
-    return 1 if re.search(r'#\w+', str(text)) else 0
-
-def has_url(text):
-    url_regex = r'(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)' \
-                r'(?:[^\s()<>]+|\(([^\s()<>]+|(\([^\s()<>]+\)))*\))+' \
-                r'(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:\'".,<>?«»“”‘’]))'
-    return 1 if re.search(url_regex, str(text)) else 0
+def predict_rows(rows, stage='predict', bundle=None):
+    bundle = bundle or current_bundle()
+    with metrics.timer('tie_stage_duration_seconds', stage=stage):
+        return bundle.model.predict(rows)
+
+def predict_one(row):
+    if batcher is not None:
+        # includes the time spent waiting for the batch to fill; rows are only batched
+        # with rows of the same bundle, so a reload never mixes versions in one predict
+        with metrics.timer('tie_stage_duration_seconds', stage='predict'):
+            # a stuck batcher fails this request instead of hanging the thread forever
+            return batcher.predict(row, timeout=BATCH_TIMEOUT, context=current_bundle())
+    return predict_rows(np.array([row]))[0]
+
+def batcher_metrics():
+    stats = batcher.stats()
+    return {
+        'tie_batcher_batches_total': stats['batches'],
+        'tie_batcher_rows_total': stats['rows'],
+        'tie_batcher_errors_total': stats['errors'],
+        'tie_batcher_queue_depth': stats['queue_depth'],
+    }
+
+def polarity_cache_metrics():
+    stats = polarity_cache.stats()
+    return {
+        'tie_polarity_cache_hits_total': stats['hits'],
+        'tie_polarity_cache_disk_hits_total': stats['disk_hits'],
+        'tie_polarity_cache_misses_total': stats['misses'],
+        'tie_polarity_cache_evictions_total': stats['evictions'],
+        'tie_polarity_cache_size': stats['size'],
+    }
+
+def model_metrics():
+    # tie_model_info summed over workers = how many workers serve each version
+    return {
+        ('tie_model_info', (('version', models.active.version),)): 1,
+        'tie_model_reloads_total': models.reloads,
+        'tie_model_reload_errors_total': models.reload_errors,
+    }
+
+# text with a bit of everything (emoji, hashtag, url, sentiment words) that no cache has seen
+WARMUP_TEXT = 'warming up: is this launch great or terrible? #tie https://example.com 🚀'
+
+# pid of the process whose warm-up finished, and how long it took
+warmup = {'pid': None, 'seconds': None, 'started_pid': None}
+warmup_lock = threading.Lock()
+
+def warm_up():
+    """Runs every lazy step of a request once in this process, before it takes traffic.
+
+    TextBlob loads its lexicon and corpora on first use, sklearn/XGBoost set up their
+    thread pools on the first predict, and jinja and the regexes have first-call costs.
+    gunicorn.conf.py calls this in each worker before it accepts connections.
+    """
+    if warmup['pid'] == os.getpid():
+        return warmup['seconds']
+    start = time.perf_counter()
+    with metrics.suspended():
+        # starts the bundle watcher in this worker too
+        bundle = models.active
+        # straight to the backend: a polarity cache hit would skip loading it
+        POLARITY_BACKENDS[POLARITY_BACKEND][0](WARMUP_TEXT)
+        get_polarity(WARMUP_TEXT)
+        rows = [
+            build_feature_row(generate_for('nike', tweet_type, 'warm up'), 'nike', False, 12, bundle)
+            for tweet_type in tweet_generator.get_supported_tweet_types()
+        ]
+        build_feature_row(WARMUP_TEXT, 'nike', True, 12, bundle)
+        # the one-row, batch (micro-batcher thread included) and 24-row predict paths
+        predict_one(rows[0])
+        ranked, _ = rank_candidates('nike', 'all', 'warm up', False, 12)
+        best_hour, curve = sweep_hours(rows[0])
+        page_template.render(
+            response={'success': True, 'generated_tweet': ranked[0]['generated_tweet'],
+                      'predicted_likes': ranked[0]['predicted_likes'], 'alternatives': ranked[1:],
+                      'hour_curve': curve, 'best_hour': best_hour, 'max_likes': 1, 'error': None},
+            error=None, company='nike', tweet_type='tip', message='warm up', has_media=False, hour=best_hour,
+            best_tweet=True, best_hour=True, supported_tweet_types=tweet_generator.get_supported_tweet_types()
+        )
+    warmup['seconds'] = time.perf_counter() - start
+    warmup['pid'] = os.getpid()
+    print(f"[pid {os.getpid()}] warmed up in {warmup['seconds']:.2f}s (model {bundle.version})", file=sys.stderr)
+    # so /metrics shows this worker as ready even before it has served anything
+    metrics.flush()
+    return warmup['seconds']
+
+def warm_up_in_background():
+    # for servers that don't call warm_up() themselves: the first request of a process
+    # starts it, and /ready says 503 until it is done
+    with warmup_lock:
+        if warmup['started_pid'] == os.getpid():
+            return
+        warmup['started_pid'] = os.getpid()
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+def warmup_metrics():
+    if warmup['pid'] != os.getpid():
+        return {'tie_workers_ready': 0}
+    return {
+        'tie_workers_ready': 1,
+        ('tie_warmup_seconds', (('pid', str(os.getpid())),)): warmup['seconds'],
+    }
+
+metrics.add_collector(polarity_cache_metrics)
+metrics.add_collector(model_metrics)
+metrics.add_collector(warmup_metrics)
+if batcher is not None:
+    metrics.add_collector(batcher_metrics)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if warmup['pid'] != os.getpid():
+        warm_up_in_background()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or 'unknown'
+    if 'request_start' in g:
+        metrics.observe('tie_request_duration_seconds', time.perf_counter() - g.request_start, endpoint=endpoint)
+    metrics.inc('tie_requests_total', endpoint=endpoint, status=str(response.status_code))
+    if 'bundle' in g:
+        response.headers['X-Model-Version'] = g.bundle.version
+    return response
 
 @app.route('/', methods=['GET', 'POST'])
 def home():
+    # the page's predictions (and X-Model-Version) come from this request's bundle, GET included
+    current_bundle()
     response = error = None
     company = ''
     tweet_type = 'announcement'
     message = ''
     has_media = False
     hour = 12
+    best_tweet = False
+    best_hour = False
 
     supported_tweet_types = tweet_generator.get_supported_tweet_types()
 
@@ -680,92 +532,226 @@ def home():
         tweet_type = request.form.get('tweet_type', 'announcement').strip().lower()
         message = request.form.get('message', '').strip()
         has_media = request.form.get('has_media') == 'on'
-        try:
-            hour = int(request.form.get('hour', 12))
-            if not (0 <= hour <= 23):
-                hour = 12
-        except ValueError:
-            hour = 12
+        hour = parse_hour(request.form.get('hour', 12))
+        best_tweet = request.form.get('best_tweet') == 'on'
+        best_hour = request.form.get('best_hour') == 'on'
 
         if tweet_type not in supported_tweet_types:
             tweet_type = 'general'
 
         try:
-            # Pass topic only for certain tweet types
-            topic = message if tweet_type in ['question', 'tip'] else None
-
-            generated_tweet = tweet_generator.generate_tweet(
-                company=company.title(),
-                tweet_type=tweet_type,
-                message=message if message else None,
-                topic=topic if topic else None
-            )
-
-            word_count = len(generated_tweet.split())
-            char_count = len(generated_tweet)
-            polarity = get_polarity(generated_tweet)
-            sentiment_str = get_sentiment(polarity)
-            sentiment_neg, sentiment_pos = encode_sentiment(sentiment_str)
-
-            # Encode company if known
-            if company in company_encoder.classes_:
-                company_encoded = int(company_encoder.transform([company])[0])
+            if best_tweet:
+                # every template of this type scored together, best one first
+                ranked, _, ranked_rows = rank_candidates(company, tweet_type, message, has_media, hour,
+                                                         top_k=3, with_rows=True)
+                features = ranked_rows[0]
+                response = {
+                    'success': True,
+                    'generated_tweet': ranked[0]['generated_tweet'],
+                    'predicted_likes': ranked[0]['predicted_likes'],
+                    'alternatives': ranked[1:],
+                    'error': None
+                }
             else:
-                company_encoded = 0
-
-            emoji_count = count_emojis(generated_tweet)
-            url_flag = has_url(generated_tweet)
-            hashtag_flag = has_hashtag(generated_tweet)
-
-            tfidf_mean = 0.1
-            company_avg_likes = company_avg_likes_map.get(company, 100)
-
-            features = np.array([[
-                word_count,
-                char_count,
-                int(has_media),
-                hour,
-                company_encoded,
-                emoji_count,
-                url_flag,
-                hashtag_flag,
-                tfidf_mean,
-                company_avg_likes,
-                sentiment_neg,
-                sentiment_pos
-            ]])
-
-            predicted_likes = model.predict(features)[0]
-            predicted_likes = int(round(predicted_likes))
-
-            response = {
-                'success': True,
-                'generated_tweet': generated_tweet,
-                'predicted_likes': predicted_likes,
-                'error': None
-            }
+                generated_tweet, lexical = generate_for(company, tweet_type, message, with_features=True)
+                features = build_feature_row(generated_tweet, company, has_media, hour, lexical=lexical)
+
+                predicted_likes = int(round(predict_one(features)))
+
+                response = {
+                    'success': True,
+                    'generated_tweet': generated_tweet,
+                    'predicted_likes': predicted_likes,
+                    'error': None
+                }
+
+            if best_hour:
+                # same tweet at all 24 hours, the hour field is just the starting guess;
+                # its features are already built, sweep_hours only changes the hour column
+                hour, response['hour_curve'] = sweep_hours(features)
+                response['predicted_likes'] = response['hour_curve'][hour]['predicted_likes']
+                response['best_hour'] = hour
+                response['max_likes'] = max(point['predicted_likes'] for point in response['hour_curve']) or 1
 
         except Exception as e:
             error = f"Internal error: {str(e)}"
             response = {'success': False, 'generated_tweet': '', 'predicted_likes': 0, 'error': str(e)}
 
-    return render_template_string(
-        PAGE_TEMPLATE,
-        response=response,
-        error=error,
-        company=company,
-        tweet_type=tweet_type,
-        message=message,
-        has_media=has_media,
-        hour=hour,
-        supported_tweet_types=supported_tweet_types
-    )
+    with metrics.timer('tie_stage_duration_seconds', stage='render'):
+        return page_template.render(
+            response=response,
+            error=error,
+            company=company,
+            tweet_type=tweet_type,
+            message=message,
+            has_media=has_media,
+            hour=hour,
+            best_tweet=best_tweet,
+            best_hour=best_hour,
+            supported_tweet_types=supported_tweet_types
+        )
+
+@app.route('/api/predict', methods=['POST'])
+def api_predict():
+    """Scores a list of generate-and-predict jobs with a single model.predict call.
+
+    Body is either a JSON list of jobs or {"jobs": [...]}, where each job looks like
+    {"company": "nike", "tweet_type": "tip", "message": "...", "has_media": true, "hour": 18}.
+    Results come back in the same order as the jobs; a bad job doesn't fail the batch.
+    """
+    payload = request.get_json(silent=True)
+    jobs = payload.get('jobs') if isinstance(payload, dict) else payload
+    if not isinstance(jobs, list) or not jobs:
+        return jsonify({'error': 'Expected a non-empty list of jobs.'}), 400
+    if len(jobs) > MAX_API_JOBS:
+        return jsonify({'error': f'Too many jobs (max {MAX_API_JOBS} per request).'}), 413
+
+    results = []
+    rows = []
+    row_slots = []
+
+    for job in jobs:
+        if not isinstance(job, dict):
+            results.append({'success': False, 'generated_tweet': '', 'predicted_likes': 0,
+                            'error': 'Each job must be a JSON object.'})
+            continue
+
+        try:
+            company, tweet_type, message, has_media, hour = parse_job(job)
+        except ValueError as e:
+            results.append({'success': False, 'generated_tweet': '', 'predicted_likes': 0, 'error': str(e)})
+            continue
+        except Exception as e:
+            # like a feature failure below: this job fails, the batch goes on
+            results.append({'success': False, 'generated_tweet': '', 'predicted_likes': 0,
+                            'error': f'Internal error: {str(e)}'})
+            continue
+
+        generated_tweet, lexical = generate_for(company, tweet_type, message, with_features=True)
+        # the generator reports bad input as an "Error: ..." tweet instead of raising
+        if generated_tweet.startswith('Error:'):
+            results.append({'success': False, 'generated_tweet': '', 'predicted_likes': 0,
+                            'error': generated_tweet[len('Error:'):].strip()})
+            continue
+
+        # a job whose features can't be built fails on its own, not the whole batch
+        try:
+            row = build_feature_row(generated_tweet, company, has_media, hour, lexical=lexical)
+        except Exception as e:
+            results.append({'success': False, 'generated_tweet': generated_tweet, 'predicted_likes': 0,
+                            'error': f'Internal error: {str(e)}'})
+            continue
+
+        row_slots.append(len(results))
+        rows.append(row)
+        results.append({'success': True, 'generated_tweet': generated_tweet, 'predicted_likes': 0, 'error': None})
+
+    if rows:
+        try:
+            predictions = predict_rows(np.array(rows))
+        except Exception as e:
+            return jsonify({'error': f'Internal error: {str(e)}'}), 500
+        for slot, predicted_likes in zip(row_slots, predictions):
+            results[slot]['predicted_likes'] = int(round(predicted_likes))
+
+    return jsonify({'results': results, 'model_version': current_bundle().version})
+
+@app.route('/api/best_tweet', methods=['POST'])
+def api_best_tweet():
+    """Renders every template for the job's tweet_type ("all" for every type), scores them
+    in one model.predict call and returns the top_k (default 3) by predicted likes.
+    """
+    job = request.get_json(silent=True)
+    if not isinstance(job, dict):
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    try:
+        company, tweet_type, message, has_media, hour = parse_job(job, allow_all=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        top_k = int(job.get('top_k', 3))
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({'error': 'top_k must be an integer.'}), 400
+
+    try:
+        ranked, scored = rank_candidates(company, tweet_type, message, has_media, hour, top_k=top_k)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Internal error: {str(e)}'}), 500
+
+    return jsonify({'candidates_scored': scored, 'results': ranked, 'model_version': current_bundle().version})
+
+@app.route('/api/best_hour', methods=['POST'])
+def api_best_hour():
+    """Generates one tweet for the job and predicts it at every hour 0-23 in one call.
+
+    Returns the tweet, the best hour and the whole curve; the job's own "hour" is ignored.
+    """
+    job = request.get_json(silent=True)
+    if not isinstance(job, dict):
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    try:
+        company, tweet_type, message, has_media, hour = parse_job(job)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    generated_tweet, lexical = generate_for(company, tweet_type, message, with_features=True)
+    if generated_tweet.startswith('Error:'):
+        return jsonify({'error': generated_tweet[len('Error:'):].strip()}), 400
+
+    try:
+        best_hour, curve = sweep_hours(build_feature_row(generated_tweet, company, has_media, hour, lexical=lexical))
+    except Exception as e:
+        return jsonify({'error': f'Internal error: {str(e)}'}), 500
+
+    return jsonify({
+        'generated_tweet': generated_tweet,
+        'best_hour': best_hour,
+        'predicted_likes': curve[best_hour]['predicted_likes'],
+        'hours': curve,
+        'model_version': current_bundle().version
+    })
+
+@app.route('/api/batcher/stats')
+def api_batcher_stats():
+    if batcher is None:
+        return jsonify({'error': 'Micro-batching is disabled (set TIE_MICRO_BATCH=1).'}), 404
+    return jsonify(batcher.stats())
+
+@app.route('/static/<path:filename>')
+def static_file(filename):
+    found = static_assets.response(filename, request.accept_encodings, request.headers.get('If-None-Match'))
+    if found is None:
+        abort(404)
+    return found
+
+@app.route('/ready')
+def ready():
+    """Load balancer readiness check: 503 until this worker has finished warm_up()"""
+    if warmup['pid'] != os.getpid():
+        return jsonify({'ready': False, 'pid': os.getpid()}), 503
+    return jsonify({
+        'ready': True,
+        'pid': os.getpid(),
+        'warmup_seconds': warmup['seconds'],
+        'model_version': models.active.version,
+    })
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/polarity_cache/stats')
+def api_polarity_cache_stats():
+    return jsonify(polarity_cache.stats())
 
 
 
 # had to make it global to avoid circular import issues which I was facing  with render
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 10000))
+    warm_up()
     app.run(host='0.0.0.0', port=port)
 
 
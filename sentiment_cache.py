@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """The cache key, and the text polarity is computed on.
+
+    Collapsing whitespace doesn't change TextBlob's polarity. Lower-casing does
+    (TextBlob(':D') is 1.0, ':d' is 0.0), and that is on purpose: training computes
+    polarity on lower-cased content, so serving has to score the text the same way to
+    give the model the feature values it was trained on. For mixed-case text,
+    get_polarity() therefore differs from TextBlob on the raw string.
+    """
+    return ' '.join(str(text).split()).lower()
+
+
+class PolarityCache:
+    """Bounded LRU of text -> polarity, optionally backed by a SQLite file.
+
+    Keys are normalize_text(text) and `compute` is called on the normalized text
+    (or `compute_many` on all of a batch's misses at once, when given).
+    The in-memory LRU holds at most `maxsize` entries; with `path` set, misses also
+    check (and fill) a SQLite table that training runs and app workers can share.
+    Different polarity backends should use different `table`s.
+    """
+
+    def __init__(self, compute, maxsize=10000, path=None, compute_many=None, table='polarity'):
+        self.compute = compute
+        self.compute_many = compute_many
+        self.maxsize = int(maxsize)
+        self.path = path
+        self.table = table
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connection(self):
+        # one connection per process; sqlite handles don't survive a fork
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} (text TEXT PRIMARY KEY, polarity REAL NOT NULL)')
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _remember(self, key, value):
+        # caller holds the lock
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _load(self, keys):
+        if not self.path or not keys:
+            return {}
+        found = {}
+        keys = list(keys)
+        with self._lock:
+            db = self._connection()
+            # stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                found.update(db.execute(
+                    f'SELECT text, polarity FROM {self.table} WHERE text IN ({placeholders})', chunk))
+        return found
+
+    def _store(self, values):
+        if not self.path or not values:
+            return
+        with self._lock:
+            db = self._connection()
+            db.executemany(f'INSERT OR IGNORE INTO {self.table} (text, polarity) VALUES (?, ?)', values.items())
+            db.commit()
+
+    def get(self, text):
+        return self.get_many([text])[0]
+
+    def get_many(self, texts):
+        """Polarity for each text, in order; each distinct uncached text is computed once"""
+        keys = [normalize_text(text) for text in texts]
+        results = {}
+        with self._lock:
+            for key in keys:
+                if key in results:
+                    continue
+                value = self._entries.get(key)
+                if value is not None:
+                    self._entries.move_to_end(key)
+                    results[key] = value
+                    self.hits += 1
+
+        missing = {key for key in keys if key not in results}
+        from_disk = self._load(missing)
+        to_compute = [key for key in missing if key not in from_disk]
+        if self.compute_many is not None and to_compute:
+            computed = dict(zip(to_compute, map(float, self.compute_many(to_compute))))
+        else:
+            computed = {key: float(self.compute(key)) for key in to_compute}
+        self._store(computed)
+
+        with self._lock:
+            self.disk_hits += len(from_disk)
+            self.misses += len(computed)
+            for key, value in list(from_disk.items()) + list(computed.items()):
+                self._remember(key, value)
+        results.update(from_disk)
+        results.update(computed)
+        return [results[key] for key in keys]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'persistent': bool(self.path),
+            }
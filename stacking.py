@@ -0,0 +1,142 @@
+"""Stacking trainer that fits the base learners concurrently and caches their work on disk.
+
+sklearn's StackingRegressor fits each base learner cv + 1 times (once per fold for the
+out-of-fold predictions, once on everything), one learner after another, and does all of
+it again whenever anything changes, final estimator included. CachedStackingRegressor
+does the same fits, but:
+
+- every (learner, fold) fit is its own task, run in a thread pool. Each task's n_jobs is
+  set to a share of the thread budget (`jobs`, default every core), so RandomForest and
+  XGBoost don't each try to use every core at once
+- each learner's out-of-fold predictions and full-data fit are saved under cache_dir,
+  keyed by a hash of the training data, the learner's class and params, and the folds.
+  Changing only the final estimator (or passthrough) reuses all of them, and a learner
+  whose params changed is the only one refit
+
+The fitted model has the attributes compiled_model.CompiledStackingModel and bulk_score
+read from a StackingRegressor (estimators_, final_estimator_, stack_method_, passthrough),
+so it pickles to like_predictor.pkl and serves the same way.
+"""
+import os
+
+import joblib
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import KFold
+
+# params that change how fast a learner trains, not what it learns
+RUNTIME_PARAMS = {'n_jobs', 'nthread', 'verbose', 'verbosity'}
+
+
+def stack_cache_dir():
+    return os.environ.get('TIE_STACK_CACHE_DIR', '.tie_stack_cache')
+
+
+def learner_key(estimator, data_digest, cv):
+    params = {key: value for key, value in estimator.get_params(deep=False).items() if key not in RUNTIME_PARAMS}
+    return joblib.hash((type(estimator).__module__, type(estimator).__name__, params, data_digest, cv))
+
+
+def _rows(X, index):
+    return X.iloc[index] if hasattr(X, 'iloc') else X[index]
+
+
+def _fit(estimator, threads, X, y, train):
+    estimator = clone(estimator)
+    if 'n_jobs' in estimator.get_params():
+        estimator.set_params(n_jobs=threads)
+    if train is None:
+        estimator.fit(X, y)
+    else:
+        estimator.fit(_rows(X, train), _rows(y, train))
+    return estimator
+
+
+class CachedStackingRegressor:
+    """StackingRegressor(estimators, final_estimator, cv, passthrough) with cached base learners"""
+
+    def __init__(self, estimators, final_estimator, cv=5, passthrough=False, cache_dir=None, jobs=None):
+        self.estimators = estimators
+        self.final_estimator = final_estimator
+        self.cv = cv
+        self.passthrough = passthrough
+        self.cache_dir = cache_dir
+        self.jobs = jobs
+
+    def _paths(self, name, key):
+        directory = os.path.join(self.cache_dir or stack_cache_dir(), f'{name}-{key}')
+        return os.path.join(directory, 'model.joblib'), os.path.join(directory, 'oof.npy')
+
+    def fit(self, X, y, log=print):
+        # same folds StackingRegressor uses for a regressor with cv=5
+        folds = list(KFold(self.cv).split(X))
+        data_digest = joblib.hash((X, y))
+
+        self.estimators_ = [None] * len(self.estimators)
+        oof = [None] * len(self.estimators)
+        todo = []
+        for i, (name, estimator) in enumerate(self.estimators):
+            model_path, oof_path = self._paths(name, learner_key(estimator, data_digest, self.cv))
+            if os.path.exists(model_path) and os.path.exists(oof_path):
+                self.estimators_[i] = joblib.load(model_path)
+                oof[i] = np.load(oof_path)
+                log(f'{name}: cached ({os.path.dirname(model_path)})')
+            else:
+                todo.append(i)
+
+        if todo:
+            tasks = [(i, fold) for i in todo for fold in range(len(folds) + 1)]
+            budget = self.jobs or os.cpu_count() or 1
+            workers = min(len(tasks), budget)
+            threads = max(1, budget // workers)
+            log(f"fitting {', '.join(self.estimators[i][0] for i in todo)}: "
+                f'{len(tasks)} fits, {workers} at a time with {threads} thread(s) each')
+            # threads, not processes: both libraries release the GIL while building trees,
+            # and X is shared instead of copied into every worker
+            fitted = Parallel(n_jobs=workers, prefer='threads')(
+                delayed(_fit)(self.estimators[i][1], threads, X, y, folds[fold][0] if fold < len(folds) else None)
+                for i, fold in tasks
+            )
+            fits = dict(zip(tasks, fitted))
+
+            for i in todo:
+                name, estimator = self.estimators[i]
+                predictions = np.empty(len(y), dtype=np.float64)
+                for fold, (_, valid) in enumerate(folds):
+                    predictions[valid] = fits[(i, fold)].predict(_rows(X, valid))
+                model = fits[(i, len(folds))]
+                if 'n_jobs' in estimator.get_params():
+                    # back to what was asked for, so serving isn't pinned to the training split
+                    model.set_params(n_jobs=estimator.get_params()['n_jobs'])
+
+                model_path, oof_path = self._paths(name, learner_key(estimator, data_digest, self.cv))
+                os.makedirs(os.path.dirname(model_path), exist_ok=True)
+                joblib.dump(model, model_path + '.tmp')
+                os.replace(model_path + '.tmp', model_path)
+                # the .npy goes last, so a cache entry with both files is always complete
+                with open(oof_path + '.tmp', 'wb') as f:
+                    np.save(f, predictions)
+                os.replace(oof_path + '.tmp', oof_path)
+                self.estimators_[i] = model
+                oof[i] = predictions
+
+        self.named_estimators_ = {name: model for (name, _), model in zip(self.estimators, self.estimators_)}
+        self.stack_method_ = ['predict'] * len(self.estimators)
+        self.n_features_in_ = X.shape[1]
+        if hasattr(X, 'columns'):
+            self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        self.final_estimator_ = clone(self.final_estimator).fit(self._stack(np.column_stack(oof), X), y)
+        return self
+
+    def _stack(self, predictions, X):
+        if self.passthrough:
+            return np.hstack([predictions, np.asarray(X)])
+        return predictions
+
+    def transform(self, X):
+        """The base learners' predictions, one column each"""
+        return np.column_stack([model.predict(X) for model in self.estimators_])
+
+    def predict(self, X):
+        return self.final_estimator_.predict(self._stack(self.transform(X), X))
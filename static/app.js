@@ -0,0 +1,33 @@
+// Initialize mode based on localStorage or default to light mode
+const body = document.body;
+const toggleBtn = document.getElementById('toggle-dark-mode');
+const darkModeClass = 'dark-mode';
+
+function updateToggleButtonText() {
+  if(body.classList.contains(darkModeClass)) {
+    toggleBtn.textContent = 'Toggle to Light Mode';
+  } else {
+    toggleBtn.textContent = 'Toggle to Dark Mode';
+  }
+}
+
+toggleBtn.addEventListener('click', () => {
+  body.classList.toggle(darkModeClass);
+  if(body.classList.contains(darkModeClass)) {
+    localStorage.setItem('mode', 'dark');
+  } else {
+    localStorage.setItem('mode', 'light');
+  }
+  updateToggleButtonText();
+});
+
+// On page load, set the mode based on saved preferences
+window.addEventListener('DOMContentLoaded', () => {
+  const savedMode = localStorage.getItem('mode');
+  if(savedMode === 'dark') {
+    body.classList.add(darkModeClass);
+  } else {
+    body.classList.remove(darkModeClass);
+  }
+  updateToggleButtonText();
+});
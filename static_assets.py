@@ -0,0 +1,76 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:  # optional, gzip alone still covers every browser
+    brotli = None
+
+# fingerprinted URLs change whenever the content does, so browsers can keep them forever
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class StaticAssets:
+    """Serves the files in `directory` under content-hashed names like style.3f2a9c1d0b4e.css.
+
+    Every file is read, hashed and compressed once at startup (gzip, plus brotli when the
+    `brotli` package is installed); a request just picks the smallest variant the client
+    accepts. Templates link to url(name) so a changed file gets a new URL.
+    """
+
+    def __init__(self, directory, url_prefix='/static/'):
+        self.url_prefix = url_prefix
+        self.names = {}   # 'style.css' -> 'style.<hash>.css'
+        self.assets = {}  # 'style.<hash>.css' -> (mimetype, etag, {encoding: bytes})
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    self.add(name, f.read())
+
+    def add(self, name, content):
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        stem, ext = os.path.splitext(name)
+        fingerprinted = f'{stem}.{digest}{ext}'
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if mimetype.startswith('text/') or mimetype == 'application/javascript':
+            mimetype += '; charset=utf-8'
+
+        variants = {'identity': content}
+        compressed = {'gzip': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed['br'] = brotli.compress(content, quality=11)
+        for encoding, body in compressed.items():
+            if len(body) < len(content):
+                variants[encoding] = body
+
+        self.names[name] = fingerprinted
+        self.assets[fingerprinted] = (mimetype, f'"{digest}"', variants)
+
+    def url(self, name):
+        return self.url_prefix + self.names[name]
+
+    def response(self, fingerprinted, accept_encodings, if_none_match=None):
+        """Returns (body, status, headers) for one asset, or None if there is no such file.
+
+        `accept_encodings` is werkzeug's request.accept_encodings.
+        """
+        asset = self.assets.get(fingerprinted)
+        if asset is None:
+            return None
+        mimetype, etag, variants = asset
+        headers = {'Cache-Control': IMMUTABLE, 'ETag': etag, 'Vary': 'Accept-Encoding'}
+        if if_none_match and etag in if_none_match:
+            return b'', 304, headers
+
+        # smallest variant the client takes; 'identity' is always there as the fallback
+        encoding = min(
+            (name for name in variants if name == 'identity' or accept_encodings[name]),
+            key=lambda name: len(variants[name])
+        )
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        headers['Content-Type'] = mimetype
+        return variants[encoding], 200, headers
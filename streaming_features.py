@@ -0,0 +1,155 @@
+"""Out-of-core version of the feature block in SJ_model_week3.py.
+
+The in-memory script needs the whole corpus in one DataFrame (and TfidfVectorizer sees
+every document at once). Here the data is read twice in chunks instead:
+
+1. pass 1 counts rows, TF-IDF document frequencies, the set of companies and each
+   company's like sum/count. These are the only numbers that depend on the whole corpus.
+2. pass 2 computes every FEATURE_COLUMNS value chunk by chunk and writes it into a
+   float32 .npy file opened as a memmap.
+
+Peak memory is one chunk plus the vocabulary and company tables, which grow with
+distinct words/companies rather than rows. The TF-IDF is exact (same vocabulary, IDF and
+l2 normalization as the default TfidfVectorizer), so the tfidf_vocab.npz it writes is
+the same file serving already loads.
+
+    python streaming_features.py [source] [out_dir] [--chunksize 100000]
+
+out_dir gets features.npy (rows x FEATURE_COLUMNS), target.npy (likes), tfidf_vocab.npz
+and meta.json (row count, columns and the per-company table).
+"""
+import argparse
+import json
+import math
+import os
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from data_ingest import TRAINING_COLUMNS, iter_dataset
+from features import FEATURE_COLUMNS, FeatureExtractor
+from tfidf import TfidfVocabulary
+
+# TfidfVectorizer's default
+TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+
+
+def prepare_chunk(chunk):
+    """The row filtering and cleaning SJ_model_week3.py does, for one chunk"""
+    chunk = chunk.dropna(subset=['content', 'username', 'inferred company', 'likes'])
+    return pd.DataFrame({
+        'content': chunk['content'].astype(str).str.strip().str.lower(),
+        'company': chunk['inferred company'].astype(str),
+        'likes': chunk['likes'].astype(np.float64),
+        'has_media': chunk['media'].astype(object).fillna('no_media') != 'no_media',
+        'hour': pd.to_datetime(chunk['date'], errors='coerce').dt.hour,
+    }, index=chunk.index)
+
+
+class CorpusStats:
+    """Pass 1: the statistics that need the whole corpus, accumulated chunk by chunk"""
+
+    def __init__(self, token_pattern=TOKEN_PATTERN):
+        self.token_pattern = token_pattern
+        self._token_re = re.compile(token_pattern)
+        self.rows = 0
+        self.document_frequency = Counter()
+        # LabelEncoder in the script is fit before dropna, so codes come from every row
+        self.companies = set()
+        self.like_sums = Counter()
+        self.like_counts = Counter()
+
+    def update(self, chunk):
+        self.companies.update(chunk['inferred company'].dropna().astype(str).unique())
+        prepared = prepare_chunk(chunk)
+        self.rows += len(prepared)
+        for text in prepared['content']:
+            self.document_frequency.update(set(self._token_re.findall(text)))
+        sums = prepared.groupby('company')['likes'].agg(['sum', 'count'])
+        self.like_sums.update(sums['sum'].to_dict())
+        self.like_counts.update(sums['count'].to_dict())
+
+    def vocabulary(self):
+        """The TfidfVocabulary a default TfidfVectorizer would have fit on the same documents"""
+        terms = sorted(self.document_frequency)
+        # smooth_idf: ln((1 + n) / (1 + df)) + 1
+        idf = [math.log((1 + self.rows) / (1 + self.document_frequency[term])) + 1 for term in terms]
+        return TfidfVocabulary({term: index for index, term in enumerate(terms)}, idf, self.token_pattern)
+
+    def company_table(self):
+        """{company: {'code', 'avg_likes', 'count'}}, codes matching LabelEncoder's"""
+        return {
+            company: {
+                'code': code,
+                'avg_likes': self.like_sums[company] / self.like_counts[company] if self.like_counts[company] else None,
+                'count': int(self.like_counts[company]),
+            }
+            for code, company in enumerate(sorted(self.companies))
+        }
+
+
+def build_feature_files(source, out_dir, chunksize=100_000):
+    """Runs both passes over `source` and writes the feature files to out_dir"""
+    os.makedirs(out_dir, exist_ok=True)
+
+    stats = CorpusStats()
+    for chunk in iter_dataset(source, TRAINING_COLUMNS, chunksize):
+        stats.update(chunk)
+    vocabulary = stats.vocabulary()
+    companies = stats.company_table()
+    codes = {company: entry['code'] for company, entry in companies.items()}
+    avg_likes = {company: entry['avg_likes'] for company, entry in companies.items()}
+
+    X = np.lib.format.open_memmap(os.path.join(out_dir, 'features.npy'), mode='w+',
+                                  dtype=np.float32, shape=(stats.rows, len(FEATURE_COLUMNS)))
+    y = np.lib.format.open_memmap(os.path.join(out_dir, 'target.npy'), mode='w+',
+                                  dtype=np.float32, shape=(stats.rows,))
+    extractor = FeatureExtractor()
+    start = 0
+    for chunk in iter_dataset(source, TRAINING_COLUMNS, chunksize):
+        prepared = prepare_chunk(chunk)
+        end = start + len(prepared)
+        features = extractor.transform(
+            prepared['content'],
+            has_media=prepared['has_media'].to_numpy(),
+            hour=prepared['hour'].to_numpy(dtype=np.float64),
+            company_encoded=prepared['company'].map(codes).to_numpy(),
+            company_avg_likes=prepared['company'].map(avg_likes).to_numpy(dtype=np.float64),
+            tfidf_mean=vocabulary.tfidf_means(prepared['content']),
+        )
+        X[start:end] = features.to_numpy(dtype=np.float32)
+        y[start:end] = prepared['likes'].to_numpy(dtype=np.float32)
+        start = end
+    X.flush()
+    y.flush()
+
+    vocabulary.save(os.path.join(out_dir, 'tfidf_vocab.npz'))
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump({'rows': stats.rows, 'columns': FEATURE_COLUMNS, 'companies': companies}, f, indent=2)
+    return out_dir
+
+
+def load_feature_files(out_dir, mmap=True):
+    """(X DataFrame, y Series, TfidfVocabulary) from build_feature_files() output"""
+    mode = 'r' if mmap else None
+    X = np.load(os.path.join(out_dir, 'features.npy'), mmap_mode=mode)
+    y = np.load(os.path.join(out_dir, 'target.npy'), mmap_mode=mode)
+    return (
+        pd.DataFrame(X, columns=FEATURE_COLUMNS, copy=False),
+        pd.Series(y, name='likes', copy=False),
+        TfidfVocabulary.load(os.path.join(out_dir, 'tfidf_vocab.npz')),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the training feature matrix out of core.')
+    parser.add_argument('source', nargs='?', help='CSV path or URL (default: TIE_DATA_SOURCE, then the sheet)')
+    parser.add_argument('out_dir', nargs='?', default='tie_features')
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    args = parser.parse_args()
+
+    build_feature_files(args.source, args.out_dir, args.chunksize)
+    with open(os.path.join(args.out_dir, 'meta.json')) as f:
+        print(f"{json.load(f)['rows']:,} rows -> {args.out_dir}")
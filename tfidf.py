@@ -0,0 +1,104 @@
+import math
+import re
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class TfidfVocabulary:
+    """The parts of a fitted TfidfVectorizer that serving needs: term -> column and IDF weights.
+
+    Reproduces sklearn's default word analyzer (lowercase + token_pattern), raw term
+    counts times IDF and l2 row normalization, so tfidf_mean() gives the same number
+    training got from `tfidf_matrix.mean(axis=1)` without loading the vectorizer.
+    """
+
+    def __init__(self, vocabulary, idf, token_pattern=r"(?u)\b\w\w+\b"):
+        self.vocabulary = vocabulary
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.token_pattern = token_pattern
+        self._token_re = re.compile(token_pattern)
+        # plain floats are faster than numpy scalars for the few terms in one tweet
+        self._idf_list = self.idf.tolist()
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer):
+        unsupported = (
+            vectorizer.analyzer != 'word'
+            or tuple(vectorizer.ngram_range) != (1, 1)
+            or not vectorizer.lowercase
+            or vectorizer.norm != 'l2'
+            or not vectorizer.use_idf
+            or vectorizer.sublinear_tf
+            or vectorizer.preprocessor is not None
+            or vectorizer.tokenizer is not None
+            or vectorizer.strip_accents is not None
+            or vectorizer.stop_words is not None
+        )
+        if unsupported:
+            raise ValueError('Only default-style word unigram TfidfVectorizers can be exported')
+        return cls(
+            {term: int(index) for term, index in vectorizer.vocabulary_.items()},
+            vectorizer.idf_,
+            vectorizer.token_pattern,
+        )
+
+    def save(self, path):
+        terms = [''] * len(self.vocabulary)
+        for term, index in self.vocabulary.items():
+            terms[index] = term
+        # terms are \w+ so a newline can't appear inside one; one byte buffer is far
+        # smaller than a fixed-width unicode array
+        np.savez(
+            path,
+            terms=np.frombuffer('\n'.join(terms).encode('utf-8'), dtype=np.uint8),
+            idf=self.idf,
+            token_pattern=np.array(self.token_pattern),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            terms = data['terms'].tobytes().decode('utf-8').split('\n')
+            return cls({term: index for index, term in enumerate(terms)}, data['idf'], str(data['token_pattern']))
+
+    def tfidf_mean(self, text):
+        """Mean of the l2-normalized TF-IDF row for one text, over the whole vocabulary"""
+        counts = {}
+        for token in self._token_re.findall(str(text).lower()):
+            index = self.vocabulary.get(token)
+            if index is not None:
+                counts[index] = counts.get(index, 0) + 1
+        if not counts:
+            return 0.0
+        weights = [count * self._idf_list[index] for index, count in counts.items()]
+        norm = math.sqrt(sum(weight * weight for weight in weights))
+        return sum(weights) / norm / len(self._idf_list)
+
+    def transform(self, texts):
+        """Sparse l2-normalized TF-IDF rows for many texts, like vectorizer.transform()"""
+        indices = []
+        indptr = [0]
+        for text in texts:
+            for token in self._token_re.findall(str(text).lower()):
+                index = self.vocabulary.get(token)
+                if index is not None:
+                    indices.append(index)
+            indptr.append(len(indices))
+
+        indices = np.asarray(indices, dtype=np.int32)
+        matrix = csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), indices, np.asarray(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, len(self.idf)),
+        )
+        matrix.sum_duplicates()
+        matrix.data *= self.idf[matrix.indices]
+
+        row_norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        row_norms[row_norms == 0] = 1.0
+        matrix.data /= np.repeat(row_norms, np.diff(matrix.indptr))
+        return matrix
+
+    def tfidf_means(self, texts):
+        """tfidf_mean() for many texts at once"""
+        return np.asarray(self.transform(texts).sum(axis=1)).ravel() / len(self.idf)
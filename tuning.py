@@ -0,0 +1,221 @@
+"""Successive-halving search for the XGBoost base model, with a resumable journal.
+
+Replaces the commented-out RandomizedSearchCV in SJ_model_week3.py. Candidates are drawn
+from the same distributions (PARAM_DISTRIBUTIONS) and raced in rungs: every candidate
+is cross-validated with a small number of boosting rounds, the best 1/eta move on to
+eta times more rounds, and so on until one is left. The last rung uses each candidate's
+full n_estimators. Every fold uses early stopping, so the winner's n_estimators is the
+number of rounds that actually helped, not the sampled upper bound.
+
+Each finished trial (params, rung, rounds, RMSE, fit time) is appended to a JSONL
+journal as soon as it completes. Rerunning with the same journal skips finished trials,
+so an interrupted search resumes where it stopped. The winner goes to best_params.json,
+which the stacking build reads through load_best_params().
+
+    TIE_TUNE=1 python SJ_model_week3.py         # tune on the training split, then train
+    python tuning.py tie_features/ [--jobs 8]   # tune on streaming_features.py output
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+from joblib import Parallel, delayed
+from scipy.stats import randint, uniform
+from sklearn.model_selection import KFold, ParameterSampler
+
+# same search space as the old RandomizedSearchCV
+PARAM_DISTRIBUTIONS = {
+    'n_estimators': randint(100, 2000),
+    'max_depth': randint(3, 10),
+    'learning_rate': uniform(0.01, 0.2),
+}
+
+
+def best_params_path():
+    return os.environ.get('TIE_BEST_PARAMS_PATH', 'best_params.json')
+
+
+def load_best_params(model, default=None):
+    """Tuned params for `model` ('xgb') from best_params.json, or `default` when there are none"""
+    try:
+        with open(best_params_path()) as f:
+            return json.load(f)[model]['params']
+    except (OSError, ValueError, KeyError):
+        return default
+
+
+def save_best_params(model, params, **info):
+    path = best_params_path()
+    try:
+        with open(path) as f:
+            everything = json.load(f)
+    except (OSError, ValueError):
+        everything = {}
+    everything[model] = {'params': params, **info}
+    with open(path + '.tmp', 'w') as f:
+        json.dump(everything, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def sample_candidates(n, seed=42):
+    # plain python numbers so they round-trip through JSON unchanged
+    return [{key: value.item() if hasattr(value, 'item') else value for key, value in params.items()}
+            for params in ParameterSampler(PARAM_DISTRIBUTIONS, n, random_state=seed)]
+
+
+def evaluate(params, rounds, X, y, cv=3, early_stopping_rounds=20, seed=42):
+    """Mean validation RMSE over `cv` folds with at most `rounds` boosting rounds"""
+    from xgboost import XGBRegressor
+
+    start = time.perf_counter()
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    rmses = []
+    iterations = []
+    for train, valid in KFold(cv, shuffle=True, random_state=seed).split(X):
+        model = XGBRegressor(
+            n_estimators=rounds,
+            max_depth=params['max_depth'],
+            learning_rate=params['learning_rate'],
+            early_stopping_rounds=early_stopping_rounds,
+            random_state=seed,
+            n_jobs=1,  # candidates already run in parallel
+        )
+        model.fit(X[train], y[train], eval_set=[(X[valid], y[valid])], verbose=False)
+        predictions = model.predict(X[valid], iteration_range=(0, model.best_iteration + 1))
+        rmses.append(float(np.sqrt(np.mean((predictions - y[valid]) ** 2))))
+        iterations.append(model.best_iteration + 1)
+    return {
+        'rmse': float(np.mean(rmses)),
+        'best_rounds': int(round(np.mean(iterations))),
+        'fit_seconds': time.perf_counter() - start,
+    }
+
+
+class Journal:
+    """Append-only JSONL log of finished trials; the first line describes the search"""
+
+    def __init__(self, path, search):
+        self.path = path
+        self.trials = {}
+        if os.path.exists(path):
+            lines = self._read(path)
+            if lines and lines[0].get('search') != search:
+                raise ValueError(f'{path} belongs to a different search ({lines[0].get("search")}); '
+                                 'delete it or use another journal path')
+            for record in lines[1:]:
+                self.trials[(record['trial'], record['rung'])] = record
+        if not self.trials and not (os.path.exists(path) and os.path.getsize(path)):
+            self._write({'search': search})
+
+    @staticmethod
+    def _read(path):
+        # a run killed mid-write leaves a partial last line: drop it (that trial just
+        # reruns) and cut it off the file so the next record starts on a fresh line
+        records = []
+        offset = 0
+        with open(path, 'rb') as f:
+            raw_lines = f.readlines()
+        for i, raw in enumerate(raw_lines):
+            if raw.strip():
+                try:
+                    records.append(json.loads(raw))
+                except ValueError:
+                    if i < len(raw_lines) - 1:
+                        raise ValueError(f'{path} line {i + 1} is not valid JSON; delete the journal to start over')
+                    print(f'{path}: dropping an incomplete last record ({len(raw)} bytes) from an interrupted run',
+                          file=sys.stderr)
+                    with open(path, 'r+b') as f:
+                        f.truncate(offset)
+                    break
+            offset += len(raw)
+        return records
+
+    def _write(self, record):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def add(self, record):
+        self.trials[(record['trial'], record['rung'])] = record
+        self._write(record)
+
+
+def successive_halving(X, y, journal_path='tuning_journal.jsonl', n_candidates=27, eta=3, min_rounds=50,
+                       cv=3, jobs=-1, seed=42, early_stopping_rounds=20, log=print):
+    """Runs (or resumes) the search and saves the winner to best_params.json; returns its record"""
+    # converted once; joblib memory-maps big arrays for the workers instead of copying them
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    candidates = sample_candidates(n_candidates, seed)
+    search = {
+        'data': joblib.hash((X, y)),
+        'n_candidates': n_candidates, 'eta': eta, 'min_rounds': min_rounds, 'cv': cv,
+        'seed': seed, 'early_stopping_rounds': early_stopping_rounds,
+    }
+    journal = Journal(journal_path, search)
+
+    alive = list(range(n_candidates))
+    rung = 0
+    while True:
+        # the final race (one survivor) gets each candidate's full n_estimators
+        last = len(alive) == 1
+        todo = []
+        for trial in alive:
+            params = candidates[trial]
+            rounds = params['n_estimators'] if last else min(params['n_estimators'], min_rounds * eta ** rung)
+            if (trial, rung) not in journal.trials:
+                todo.append((trial, rounds))
+        log(f'rung {rung}: {len(alive)} candidates, {len(alive) - len(todo)} already in the journal')
+
+        results = Parallel(n_jobs=jobs, return_as='generator_unordered')(
+            delayed(_run_trial)(trial, rounds, candidates[trial], X, y, cv, early_stopping_rounds, seed)
+            for trial, rounds in todo
+        )
+        for trial, rounds, result in results:
+            journal.add({'trial': trial, 'rung': rung, 'rounds': rounds, 'params': candidates[trial], **result})
+            log(f"  trial {trial} ({rounds} rounds): rmse {result['rmse']:.2f} in {result['fit_seconds']:.1f}s")
+
+        scored = sorted(alive, key=lambda trial: journal.trials[(trial, rung)]['rmse'])
+        if last:
+            break
+        alive = scored[:max(1, len(alive) // eta)]
+        rung += 1
+
+    best = journal.trials[(scored[0], rung)]
+    params = {
+        'n_estimators': best['best_rounds'],
+        'max_depth': best['params']['max_depth'],
+        'learning_rate': best['params']['learning_rate'],
+    }
+    save_best_params('xgb', params, cv_rmse=best['rmse'], trial=best['trial'], journal=os.path.abspath(journal_path))
+    log(f"best: {params} (cv rmse {best['rmse']:.2f}) -> {best_params_path()}")
+    return best
+
+
+def _run_trial(trial, rounds, params, X, y, cv, early_stopping_rounds, seed):
+    return trial, rounds, evaluate(params, rounds, X, y, cv, early_stopping_rounds, seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Tune the XGBoost base model with successive halving.')
+    parser.add_argument('feature_dir', help='output of streaming_features.py (features.npy / target.npy)')
+    parser.add_argument('--journal', default='tuning_journal.jsonl')
+    parser.add_argument('--candidates', type=int, default=27)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--min-rounds', type=int, default=50)
+    parser.add_argument('--cv', type=int, default=3)
+    parser.add_argument('--jobs', type=int, default=-1)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from streaming_features import load_feature_files
+
+    X, y, _ = load_feature_files(args.feature_dir)
+    successive_halving(X.to_numpy(), y.to_numpy(), args.journal, args.candidates, args.eta, args.min_rounds,
+                       args.cv, args.jobs, args.seed)
@@ -1,4 +1,87 @@
 import random
+import re
+from functools import lru_cache
+from string import Formatter
+
+from lexical_scan import scan
+
+MAX_TWEET_LENGTH = 280
+# what _render fills in
+SLOT_NAMES = ('company', 'message', 'topic')
+
+# stands in for a slot while the template is cut into tokens; private use, so no
+# template text contains it and it isn't whitespace, \w or an emoji
+SLOT_MARK = '\ue000'
+
+
+@lru_cache(maxsize=4096)
+def _scan_dynamic(dynamic, company, message, topic):
+    # most templates' slot tokens are just "{company} {message}", and ranking renders
+    # the same company and message into every template, so this is usually a hit
+    return scan(dynamic.format(company=company, message=message, topic=topic))
+
+
+class TemplateSkeleton:
+    """A template's lexical features with the {slots} left open.
+
+    scan()'s counts never reach across whitespace: a word, an emoji run, a hashtag and
+    a URL each sit inside one whitespace-separated token. So the template's tokens that
+    don't touch a slot are scanned once here (`static`), and a render only scans the
+    tokens that do (`dynamic`, e.g. "{company}'s" or "{message}!"), with the slot values
+    filled in. Adding the two gives exactly what scan() returns for the whole tweet.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self.simple = SLOT_MARK not in template
+        literal_chars = 0
+        masked = []
+        slot_names = []
+        for literal, field, spec, conversion in Formatter().parse(template):
+            literal_chars += len(literal)
+            masked.append(literal)
+            if field is not None:
+                # {x.attr}, {x!r} or {x:>10} would need str.format itself to render
+                if spec or conversion or not field.isidentifier():
+                    self.simple = False
+                masked.append(SLOT_MARK)
+                slot_names.append(field)
+
+        static, dynamic = [], []
+        slots = iter(slot_names)
+        for token in re.findall(r'\S+', ''.join(masked)):
+            if SLOT_MARK in token:
+                # back into a format string: braces escaped, marks named again
+                token = token.replace('{', '{{').replace('}', '}}')
+                dynamic.append(''.join(
+                    f'{{{next(slots)}}}' + part if i else part for i, part in enumerate(token.split(SLOT_MARK))))
+            else:
+                static.append(token)
+
+        self.literal_chars = literal_chars
+        # how often {company}, {message} and {topic} appear, for the untruncated length
+        self.slot_uses = tuple(slot_names.count(name) for name in SLOT_NAMES)
+        # (word_count, emoji_count, has_hashtag, has_url) of the tokens without a slot
+        words, _, emojis, hashtag, url = scan(' '.join(static))
+        self.static = (words, emojis, hashtag, url)
+        self.dynamic = ' '.join(dynamic)
+
+    def features(self, tweet, company, message, topic):
+        """scan(tweet) for `tweet`, rendered from this template with these slot values"""
+        char_count = len(tweet)
+        uses_company, uses_message, uses_topic = self.slot_uses
+        if not self.simple or (char_count == MAX_TWEET_LENGTH and self.literal_chars + uses_company * len(company)
+                               + uses_message * len(message) + uses_topic * len(topic) > MAX_TWEET_LENGTH):
+            # truncated (always to exactly 280 chars): the cut can split any token or
+            # drop it, so the rendered tweet is scanned as is
+            return scan(tweet)
+        words, emojis, hashtag, url = self.static
+        if not self.dynamic:
+            return words, char_count, emojis, hashtag, url
+        dynamic_words, _, dynamic_emojis, dynamic_hashtag, dynamic_url = _scan_dynamic(self.dynamic, company, message, topic)
+        return (words + dynamic_words, char_count, emojis + dynamic_emojis,
+                hashtag | dynamic_hashtag, url | dynamic_url)
+
 
 class SimpleTweetGenerator:
     def __init__(self):
@@ -45,17 +128,13 @@ class SimpleTweetGenerator:
                 "{company} proudly launches: {message} 🔥"
             ]
         }
+        # each template's fixed text scanned once, see TemplateSkeleton
+        self.skeletons = {
+            template: TemplateSkeleton(template)
+            for template_list in self.templates.values() for template in template_list
+        }
 
-    def generate_tweet(self, company, tweet_type="general", message=None, topic=None):
-        # checking if it's blank or not
-        if not company or company.strip() == "":
-            return "Error: Company name is required."
-
-        tpltype = (tweet_type or "general").strip().lower()
-        # setting 'general' as default
-        if tpltype not in self.templates:
-            tpltype = 'general'
-
+    def _fill_defaults(self, tpltype, message, topic):
         # assigning the defaults in case of blanks
         if not message or message.strip() == "":
             if tpltype == 'announcement':
@@ -83,27 +162,90 @@ class SimpleTweetGenerator:
             else:
                 topic = "innovation"
 
+        return message, topic
+
+    def _render(self, template, company, message, topic):
+        tweet = template.format(
+            company=company,
+            message=message,
+            topic=topic
+        )
+
+        # Truncate if too long (max 280 tweets as per X regulation)
+        if len(tweet) > MAX_TWEET_LENGTH:
+            tweet = tweet[:MAX_TWEET_LENGTH - 3] + "..."
+
+        return tweet
+
+    def _render_with_features(self, template, company, message, topic):
+        """(_render(...), scan() of it) without rescanning the template's fixed text"""
+        tweet = self._render(template, company, message, topic)
+        skeleton = self.skeletons.get(template) or TemplateSkeleton(template)
+        return tweet, skeleton.features(tweet, company, message, topic)
+
+    def generate_tweet(self, company, tweet_type="general", message=None, topic=None, with_features=False):
+        # with_features=True returns (tweet, scan(tweet)), the counts taken from the template's skeleton
+
+        # checking if it's blank or not
+        if not company or company.strip() == "":
+            return self._error("Company name is required.", with_features)
+
+        tpltype = (tweet_type or "general").strip().lower()
+        # setting 'general' as default
+        if tpltype not in self.templates:
+            tpltype = 'general'
+
+        message, topic = self._fill_defaults(tpltype, message, topic)
+
         template_list = self.templates[tpltype]
         if not template_list:
-            return "Error: No templates found for this tweet type."
+            return self._error("No templates found for this tweet type.", with_features)
 
         template = random.choice(template_list)
 
         try:
-            tweet = template.format(
-                company=company,
-                message=message,
-                topic=topic
-            )
+            if with_features:
+                return self._render_with_features(template, company, message, topic)
+            tweet = self._render(template, company, message, topic)
         except Exception as e:
-            return f"Error: failed to create tweet ({e})."
-
-        # Truncate if too long (max 280 tweets as per X regulation)
-        if len(tweet) > 280:
-            tweet = tweet[:277] + "..."
+            return self._error(f"failed to create tweet ({e}).", with_features)
 
         return tweet
 
+    def _error(self, reason, with_features):
+        tweet = f"Error: {reason}"
+        return (tweet, scan(tweet)) if with_features else tweet
+
+    def generate_candidates(self, company, tweet_type=None, message=None, topic=None):
+        """Renders every template of `tweet_type` (every type when it's None or 'all').
+
+        Returns a list of {'tweet_type', 'template', 'tweet', 'lexical'} dicts so callers can
+        score all of them at once; 'lexical' is scan(tweet), from the template's skeleton.
+        Raises ValueError where generate_tweet would return "Error: ...".
+        """
+        if not company or company.strip() == "":
+            raise ValueError("Company name is required.")
+
+        if tweet_type is None or tweet_type.strip().lower() == 'all':
+            tpltypes = list(self.templates.keys())
+        else:
+            tpltype = tweet_type.strip().lower()
+            tpltypes = [tpltype if tpltype in self.templates else 'general']
+
+        candidates = []
+        for tpltype in tpltypes:
+            type_message, type_topic = self._fill_defaults(tpltype, message, topic)
+            for template in self.templates[tpltype]:
+                try:
+                    tweet, lexical = self._render_with_features(template, company, type_message, type_topic)
+                except Exception as e:
+                    raise ValueError(f"failed to create tweet ({e}).")
+                candidates.append({'tweet_type': tpltype, 'template': template, 'tweet': tweet, 'lexical': lexical})
+
+        if not candidates:
+            raise ValueError("No templates found for this tweet type.")
+        return candidates
+
     def get_supported_tweet_types(self):
         """Returns the list of supported tweet types"""
         return list(self.templates.keys())
@@ -135,3 +277,13 @@ if __name__ == "__main__":
         print(f"Test {i}:", tweet)
 
     print("\nSupported tweet types:", generator.get_supported_tweet_types())
+    print("\nAll candidates for Nike (tip):")
+    for candidate in generator.generate_candidates("Nike", "tip", message="Always stretch first"):
+        print(" -", candidate['tweet'])
+
+    # the skeletons' counts against scanning each rendered tweet, long messages included
+    mismatches = 0
+    for message in ["Always stretch first", "#fit 🏃‍♀️ www.nike.com/run", "x" * 250, "go " * 120]:
+        for candidate in generator.generate_candidates("Nike", None, message=message, topic=message):
+            mismatches += candidate['lexical'] != scan(candidate['tweet'])
+    print("\nSkeleton feature mismatches:", mismatches)